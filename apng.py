@@ -0,0 +1,53 @@
+""" Escritor APNG en streaming: cada fotograma se codifica con Pillow y sus IDAT se reempaquetan al vuelo
+
+Image.save(save_all=True) de Pillow acumula todos los fotogramas antes de escribir; aquí la memoria máxima es la
+de un fotograma decodificado más su PNG codificado.
+"""
+import io
+import struct
+import zlib
+
+# --- Constantes ---
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+MAX_DELAY_MS = 65535 # delay_num es un entero de 16 bits
+APNG_DISPOSE_NONE = 0; APNG_BLEND_SOURCE = 0
+
+
+def png_chunk(kind, data):
+    """ Chunk PNG: longitud, tipo, datos y CRC32 """
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)) & 0xffffffff)
+
+def iter_chunks(png_bytes):
+    """ Produce (tipo, datos) de cada chunk de un PNG completo en memoria """
+    view = memoryview(png_bytes); offset = len(PNG_SIGNATURE)
+    while offset + 8 <= len(view):
+        length, = struct.unpack_from(">I", view, offset); kind = bytes(view[offset + 4:offset + 8])
+        yield kind, view[offset + 8:offset + 8 + length]; offset += 12 + length
+
+
+def write_apng(frames, frame_count, output, loop=0, save_settings=None):
+    """ Escribe en output (archivo binario) un APNG con los fotogramas de `frames`, un iterable de (imagen, duración_ms)
+        Todos los fotogramas deben tener el tamaño y modo del primero (lienzo completo ya compuesto: dispose NONE,
+        blend SOURCE). frame_count va en acTL antes del primer fotograma; loop=0 repite indefinidamente.
+        save_settings son argumentos de Image.save para cada fotograma (compress_level, optimize).
+        Devuelve el número de fotogramas escritos """
+    save_settings = save_settings or {}; sequence = 0; written = 0
+    output.write(PNG_SIGNATURE)
+    for image, duration in frames:
+        buffer = io.BytesIO(); image.save(buffer, "PNG", **save_settings)
+        chunks = list(iter_chunks(buffer.getbuffer()))
+        if written == 0:
+            output.write(png_chunk(b"IHDR", bytes(next(data for kind, data in chunks if kind == b"IHDR"))))
+            output.write(png_chunk(b"acTL", struct.pack(">II", frame_count, loop)))
+        width, height = image.size
+        output.write(png_chunk(b"fcTL", struct.pack(">IIIIIHHBB", sequence, width, height, 0, 0,
+                                                    min(int(duration or 0), MAX_DELAY_MS), 1000, APNG_DISPOSE_NONE, APNG_BLEND_SOURCE)))
+        sequence += 1
+        for kind, data in chunks:
+            if kind != b"IDAT": continue
+            if written == 0: output.write(png_chunk(b"IDAT", bytes(data))) # El primer fotograma es también la imagen por defecto
+            else: output.write(png_chunk(b"fdAT", struct.pack(">I", sequence) + bytes(data))); sequence += 1
+        written += 1
+    if written != frame_count: raise ValueError(f"APNG declared {frame_count} frames but {written} were written")
+    output.write(png_chunk(b"IEND", b""))
+    return written
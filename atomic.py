@@ -0,0 +1,37 @@
+""" Escritura atómica de salidas: temporal en la misma carpeta + os.replace, con fsync opcional """
+import contextlib
+import os
+import threading
+
+
+def temp_path_for(output_path):
+    """ Ruta temporal oculta junto a la salida (mismo directorio, para que os.replace sea atómico) """
+    directory, name = os.path.split(output_path)
+    return os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+def fsync_directory(directory):
+    """ Persiste la entrada de directorio tras un rename (no disponible en Windows) """
+    if os.name != 'posix': return
+    fd = os.open(directory or '.', os.O_RDONLY)
+    try: os.fsync(fd)
+    finally: os.close(fd)
+
+@contextlib.contextmanager
+def atomic_output(output_path, fsync=False):
+    """ Archivo binario temporal que se renombra sobre output_path al salir sin error (se borra si falla):
+        nunca queda un PNG truncado con el nombre final. Con fsync=True se persiste en disco antes de volver """
+    temp_path = temp_path_for(output_path)
+    try:
+        with open(temp_path, 'wb') as f:
+            yield f
+            if fsync: f.flush(); os.fsync(f.fileno())
+        os.replace(temp_path, output_path)
+    except BaseException:
+        try: os.remove(temp_path)
+        except OSError: pass
+        raise
+    if fsync: fsync_directory(os.path.dirname(output_path))
+
+def write_atomic(output_path, data, fsync=False):
+    """ Escribe data de forma atómica (ver atomic_output) """
+    with atomic_output(output_path, fsync) as f: f.write(data)
@@ -0,0 +1,203 @@
+""" Benchmark reproducible: generador de corpus sintético WebP/JFIF y medición de las fases walk y convert
+
+Uso:
+    python benchmark.py generate CORPUS_DIR [--seed 1] [--files 400]
+    python benchmark.py run [CORPUS_DIR] [--json results.json] [--workers N] [--profile fast]
+
+Sin CORPUS_DIR, `run` genera un corpus temporal con la semilla indicada. Todo funciona sin red.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw
+
+import converter
+
+try:
+    import resource # Solo Unix; en Windows el pico de RSS no se reporta
+except ImportError:
+    resource = None
+
+# --- Constantes ---
+SIZES = ((64, 64), (320, 240), (800, 600), (1920, 1080), (3000, 2000))
+SIZE_WEIGHTS = (20, 30, 30, 15, 5)
+# (tipo, peso): los modos LA y P+tRNS no existen en WebP/JPEG, así que llegan como PNG con extensión .webp/.jfif
+KINDS = (("webp_rgb", 25), ("webp_rgba", 20), ("jfif_rgb", 25), ("jfif_l", 5), ("png_as_webp_la", 5),
+         ("png_as_webp_p_trns", 5), ("webp_animated", 5), ("corrupt", 5), ("not_an_image", 5))
+
+
+# --- Generación del corpus ---
+
+def _synthetic_image(rng, size, mode):
+    """ Imagen determinista: degradado + figuras aleatorias (comprime como una imagen real, no como ruido) """
+    img = Image.linear_gradient('L').resize(size).convert('RGB')
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(3, 12)):
+        x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+        box = (x0, y0, x0 + rng.randint(1, size[0]), y0 + rng.randint(1, size[1]))
+        color = tuple(rng.randrange(256) for _ in range(3))
+        (draw.ellipse if rng.random() < 0.5 else draw.rectangle)(box, fill=color)
+    if mode == 'RGB': return img
+    if mode == 'L': return img.convert('L')
+    alpha = Image.linear_gradient('L').rotate(rng.choice((0, 90, 180, 270))).resize(size)
+    if mode == 'RGBA': img.putalpha(alpha); return img
+    if mode == 'LA': return Image.merge('LA', (img.convert('L'), alpha))
+    if mode == 'P':
+        paletted = img.quantize(colors=rng.randint(4, 64)); paletted.info['transparency'] = 0
+        return paletted
+    raise ValueError(mode)
+
+def _write_sample(rng, path, kind):
+    """ Escribe un archivo del tipo pedido; devuelve la ruta final (con extensión) """
+    size = rng.choices(SIZES, SIZE_WEIGHTS)[0]
+    if kind == "webp_rgb": _synthetic_image(rng, size, 'RGB').save(path + ".webp", quality=rng.randint(60, 95)); return path + ".webp"
+    if kind == "webp_rgba": _synthetic_image(rng, size, 'RGBA').save(path + ".webp", lossless=rng.random() < 0.3); return path + ".webp"
+    if kind == "jfif_rgb": _synthetic_image(rng, size, 'RGB').save(path + ".jfif", "JPEG", quality=rng.randint(60, 95)); return path + ".jfif"
+    if kind == "jfif_l": _synthetic_image(rng, size, 'L').save(path + ".jif", "JPEG"); return path + ".jif"
+    if kind == "png_as_webp_la": _synthetic_image(rng, size, 'LA').save(path + ".webp", "PNG"); return path + ".webp"
+    if kind == "png_as_webp_p_trns":
+        img = _synthetic_image(rng, size, 'P'); img.save(path + ".webp", "PNG", transparency=0); return path + ".webp"
+    if kind == "webp_animated":
+        frames = [_synthetic_image(rng, (320, 240), 'RGBA') for _ in range(rng.randint(2, 8))]
+        frames[0].save(path + ".webp", save_all=True, append_images=frames[1:], duration=80, loop=0); return path + ".webp"
+    if kind == "corrupt":
+        buffer = io.BytesIO(); _synthetic_image(rng, size, 'RGB').save(buffer, "WEBP")
+        data = buffer.getvalue()
+        with open(path + ".webp", "wb") as f: f.write(data[:max(16, len(data) // rng.randint(2, 5))]) # Truncado
+        return path + ".webp"
+    with open(path + ".jfif", "wb") as f: f.write(rng.randbytes(rng.randint(100, 5000))) # Ni siquiera es imagen
+    return path + ".jfif"
+
+def generate_corpus(corpus_dir, seed=1, files=400, deep_levels=12, wide_dirs=60):
+    """ Genera un corpus determinista en corpus_dir: ~1/3 en un árbol profundo, ~1/3 en uno ancho y el resto en la raíz.
+        Devuelve el número de archivos escritos """
+    rng = random.Random(seed); kinds, weights = zip(*KINDS)
+    deep = [os.path.join(corpus_dir, "deep", *[f"level{i}" for i in range(depth + 1)]) for depth in range(deep_levels)]
+    wide = [os.path.join(corpus_dir, "wide", f"dir{i:04d}") for i in range(wide_dirs)]
+    for folder in deep + wide: os.makedirs(folder, exist_ok=True)
+    for i in range(files):
+        folder = rng.choice((corpus_dir, rng.choice(deep), rng.choice(wide)))
+        _write_sample(rng, os.path.join(folder, f"img{i:06d}"), rng.choices(kinds, weights)[0])
+    return files
+
+
+# --- Medición ---
+
+def _peak_rss_mb():
+    """ Pico de RSS del proceso actual en MB (None si no se puede medir) """
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # bytes en macOS, KB en Linux
+
+def _percentile(values, pct):
+    """ Percentil con interpolación lineal (0 si no hay valores) """
+    if not values: return 0.0
+    if len(values) == 1: return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+def _walk_phase(corpus_dir):
+    """ Fase walk (en un proceso nuevo): recorre el corpus como scan_and_convert """
+    start = time.perf_counter()
+    paths = list(converter.walk_matching_files(corpus_dir, log_func=lambda *args: None))
+    elapsed = time.perf_counter() - start
+    return {'files': len(paths), 'seconds': elapsed, 'files_per_s': len(paths) / elapsed if elapsed else 0.0,
+            'peak_rss_mb': _peak_rss_mb()}, paths
+
+def _convert_phase(paths, output_dir, profile):
+    """ Fase convert (en un proceso nuevo): convert_to_png archivo a archivo, midiendo la latencia de cada uno """
+    latencies = []; results = {'converted': 0, 'skipped': 0, 'error': 0}; bytes_in = 0
+    quiet = converter.Reporter()
+    start = time.perf_counter()
+    for i, path in enumerate(paths):
+        bytes_in += os.path.getsize(path); t0 = time.perf_counter()
+        result = converter.convert_to_png(path, os.path.join(output_dir, f"{i:06d}.png"), app_instance=quiet, overwrite=True, profile=profile)
+        latencies.append((time.perf_counter() - t0) * 1000); results[result] += 1
+    elapsed = time.perf_counter() - start
+    return {'files': len(paths), 'seconds': elapsed, 'files_per_s': len(paths) / elapsed if elapsed else 0.0,
+            'mb_per_s': bytes_in / 1048576 / elapsed if elapsed else 0.0,
+            'p50_ms': _percentile(latencies, 50), 'p99_ms': _percentile(latencies, 99),
+            'results': results, 'peak_rss_mb': _peak_rss_mb()}
+
+def _pipeline_phase(corpus_dir, output_dir, workers, profile):
+    """ Fase pipeline (en un proceso nuevo): scan_and_convert completo con `workers` procesos """
+    start = time.perf_counter()
+    counter = converter.scan_and_convert(corpus_dir, output_dir, workers=workers, use_index=False,
+                                         settings=converter.OutputSettings(profile=profile))
+    elapsed = time.perf_counter() - start
+    return {'files': counter['processed'], 'workers': workers, 'seconds': elapsed,
+            'files_per_s': counter['processed'] / elapsed if elapsed else 0.0, 'peak_rss_mb': _peak_rss_mb()}
+
+def _in_fresh_process(func, *args):
+    """ Ejecuta func en un proceso nuevo para que el pico de RSS de cada fase sea independiente """
+    with ProcessPoolExecutor(max_workers=1) as pool: return pool.submit(func, *args).result()
+
+def run_benchmark(corpus_dir, workers=0, profile=converter.DEFAULT_PROFILE):
+    """ Mide las fases walk, convert y (si workers > 1) pipeline sobre corpus_dir; devuelve un dict serializable """
+    output_dir = tempfile.mkdtemp(prefix="bench_out_")
+    try:
+        walk, paths = _in_fresh_process(_walk_phase, corpus_dir)
+        paths.sort() # Orden estable entre ejecuciones
+        report = {'corpus': os.path.abspath(corpus_dir), 'profile': profile, 'python': sys.version.split()[0],
+                  'pillow': Image.__version__, 'walk': walk, 'convert': _in_fresh_process(_convert_phase, paths, output_dir, profile)}
+        if workers > 1:
+            shutil.rmtree(output_dir); os.makedirs(output_dir)
+            report['pipeline'] = _in_fresh_process(_pipeline_phase, corpus_dir, output_dir, workers, profile)
+        return report
+    finally: shutil.rmtree(output_dir, ignore_errors=True)
+
+def format_report(report):
+    """ Resumen legible del informe """
+    rss = lambda phase: f"{phase['peak_rss_mb']:.0f} MB" if phase.get('peak_rss_mb') is not None else "n/a"
+    walk = report['walk']; convert = report['convert']
+    lines = [f"Corpus: {report['corpus']} (profile: {report['profile']}, Pillow {report['pillow']})",
+             f"walk:     {walk['files']} files in {walk['seconds']:.3f}s = {walk['files_per_s']:.0f} files/s | peak RSS {rss(walk)}",
+             f"convert:  {convert['files']} files in {convert['seconds']:.2f}s = {convert['files_per_s']:.1f} files/s, "
+             f"{convert['mb_per_s']:.2f} MB/s | p50 {convert['p50_ms']:.1f} ms, p99 {convert['p99_ms']:.1f} ms | peak RSS {rss(convert)}",
+             f"          results: {convert['results']}"]
+    if 'pipeline' in report:
+        pipeline = report['pipeline']
+        lines.append(f"pipeline: {pipeline['files']} files with {pipeline['workers']} workers in {pipeline['seconds']:.2f}s "
+                     f"= {pipeline['files_per_s']:.1f} files/s | peak RSS (parent) {rss(pipeline)}")
+    return "\n".join(lines)
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmark", description="Offline converter benchmark with a synthetic corpus.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("generate", help="Write a deterministic corpus")
+    gen.add_argument("corpus_dir"); gen.add_argument("--seed", type=int, default=1); gen.add_argument("--files", type=int, default=400)
+    run = sub.add_parser("run", help="Benchmark the walk and convert phases")
+    run.add_argument("corpus_dir", nargs="?", help="Existing corpus (default: generate a temporary one)")
+    run.add_argument("--seed", type=int, default=1); run.add_argument("--files", type=int, default=400)
+    run.add_argument("--workers", type=int, default=0, help="Also time scan_and_convert with N worker processes")
+    run.add_argument("--profile", choices=tuple(converter.ENCODING_PROFILES), default=converter.DEFAULT_PROFILE)
+    run.add_argument("--json", metavar="PATH", help="Write the machine-readable report to PATH")
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        print(f"Generated {generate_corpus(args.corpus_dir, args.seed, args.files)} files in {args.corpus_dir}"); return 0
+    corpus_dir = args.corpus_dir; temp_corpus = None
+    if corpus_dir is None:
+        corpus_dir = temp_corpus = tempfile.mkdtemp(prefix="bench_corpus_")
+        generate_corpus(corpus_dir, args.seed, args.files)
+    try: report = run_benchmark(corpus_dir, args.workers, args.profile)
+    finally:
+        if temp_corpus: shutil.rmtree(temp_corpus, ignore_errors=True)
+    if temp_corpus: report['corpus'] = f"<generated seed={args.seed} files={args.files}>"
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
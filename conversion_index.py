@@ -0,0 +1,46 @@
+""" Índice persistente (SQLite) de conversiones para re-ejecuciones incrementales """
+import os
+import sqlite3
+import time
+
+# --- Constantes ---
+INDEX_FILE_NAME = ".conversion_index.sqlite"
+COMMIT_EVERY = 500 # Registros por transacción (commits agrupados para no hacer fsync por archivo)
+
+
+class ConversionIndex:
+    """ Índice source -> (size, mtime_ns, output, settings) guardado en la carpeta de salida
+        Un origen cuyo tamaño y mtime_ns coinciden con el índice no ha cambiado desde la última conversión; settings es
+        una huella de las opciones de salida (converter.output_settings_key) para detectar cambios de opciones.
+        Los índices anteriores a la columna settings se migran con settings='' (no coincide con ninguna huella).
+        No es thread-safe: usarlo solo desde el hilo que lo creó. """
+    def __init__(self, output_folder, file_name=INDEX_FILE_NAME):
+        os.makedirs(output_folder, exist_ok=True)
+        self.path = os.path.join(output_folder, file_name)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL"); self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS conversions (source TEXT PRIMARY KEY, size INTEGER NOT NULL,"
+                          " mtime_ns INTEGER NOT NULL, output TEXT NOT NULL, converted_at REAL NOT NULL, settings TEXT NOT NULL DEFAULT '')")
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(conversions)")}
+        if 'settings' not in columns: self.conn.execute("ALTER TABLE conversions ADD COLUMN settings TEXT NOT NULL DEFAULT ''")
+        self.conn.commit(); self._uncommitted = 0
+
+    def lookup(self, source):
+        """ Devuelve (size, mtime_ns, output, settings) o None si el origen no está indexado """
+        return self.conn.execute("SELECT size, mtime_ns, output, settings FROM conversions WHERE source = ?", (source,)).fetchone()
+
+    def record(self, source, stat_result, output, settings=''):
+        """ Registra (o actualiza) una conversión; se confirma cada COMMIT_EVERY registros o en close() """
+        self.conn.execute("INSERT OR REPLACE INTO conversions (source, size, mtime_ns, output, converted_at, settings)"
+                          " VALUES (?, ?, ?, ?, ?, ?)", (source, stat_result.st_size, stat_result.st_mtime_ns, output, time.time(), settings))
+        self._uncommitted += 1
+        if self._uncommitted >= COMMIT_EVERY: self.conn.commit(); self._uncommitted = 0
+
+    def close(self):
+        """ Confirma los registros pendientes y cierra la base de datos """
+        try: self.conn.commit()
+        finally: self.conn.close()
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc_info): self.close()
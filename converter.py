@@ -1,575 +1,760 @@
 import os
 import sys
-# Intentar importar Image/ImageTk desde Pillow, manejar error si no está
+# Intentar importar Image desde Pillow, manejar error si no está
+# (este módulo no importa tkinter/customtkinter: la GUI vive en gui.py)
 try:
-    from PIL import Image, ImageTk
+    from PIL import Image, ImageChops, ImageColor, ImageSequence
 except ImportError:
     print("Error: The 'Pillow' library is required but not installed.")
     print("Please install it using: pip install Pillow")
-    try:
-        import tkinter as tk
-        from tkinter import messagebox
-        root_err = tk.Tk(); root_err.withdraw()
-        messagebox.showerror("Missing Library", "Pillow library is required.\n\nPlease install it:\npip install Pillow")
-        root_err.destroy()
-    except ImportError: pass
-    sys.exit(1)
-
-# Intentar importar CustomTkinter y tkinter base
-try:
-    import customtkinter as ctk
-    import tkinter as tk
-    from tkinter import filedialog, messagebox, simpledialog
-except ImportError as e:
-    missing_lib = "customtkinter" if "customtkinter" in str(e) else "tkinter"
-    print(f"Error: The '{missing_lib}' library is required but not installed/found.")
-    if missing_lib == "customtkinter": print("Please install it using: pip install customtkinter")
-    try:
-        if 'tk' not in locals() and 'tkinter' not in sys.modules: import tkinter as tk
-        from tkinter import messagebox
-        root_err = tk.Tk(); root_err.withdraw()
-        messagebox.showerror("Missing Library", f"'{missing_lib}' library is required.\n\nPlease install it:\npip install {missing_lib}")
-        root_err.destroy()
-    except ImportError: pass
     sys.exit(1)
 
-import platform
+import argparse
+import collections
+import hashlib
+import io
+import multiprocessing
+import queue
+import signal
+import sqlite3
 import threading
-import time # Para pequeños delays y actualizaciones de UI
-import ctypes # Para verificar y solicitar permisos de admin en Windows
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from apng import write_apng
+from atomic import atomic_output, write_atomic
+from conversion_index import INDEX_FILE_NAME, ConversionIndex
+from dedup import DEDUP_REPORT_FILE_NAME, HASH_WORKERS, LINK_MODES, DedupTracker, hash_file
+from journal import JOURNAL_FILE_NAME, JobJournal
+from metrics import RunMetrics
+from prefetch import DEFAULT_IO_BUFFER, AsyncWriter, Prefetcher, map_ahead
+from scheduler import BudgetScheduler
+from shards import ShardManifest, parse_shard, shard_file_name
+from sniff import DEFAULT_FORMATS, DEFAULT_SNIFF_MODE, FORMAT_EXTENSIONS, SNIFF_MODES, FormatFilter
+from walker import DEFAULT_WALK_WORKERS, WalkRules, walk_files
 
 # --- Constante ---
 OUTPUT_FOLDER_NAME = "converted_png_images"
-# Nombre del archivo de icono (debe estar en la misma carpeta que el script)
-# ¡¡Asegúrate que este nombre coincida con tu archivo .ico!!
-APP_ICON_FILE = "app_icon.ico" # <--- CAMBIA ESTO AL NOMBRE DE TU ICONO
-
-# --- Funciones de Admin (Windows) ---
-
-def is_admin():
-    """ Verifica si el script se está ejecutando con privilegios de administrador en Windows """
-    if platform.system() != "Windows": return False
-    try: return ctypes.windll.shell32.IsUserAnAdmin()
-    except: return False
-
-def run_as_admin():
-    """ Relanza el script actual con privilegios de administrador en Windows """
-    if platform.system() != "Windows": print("Admin relaunch only on Windows."); return False
-    lpVerb = "runas"; lpFile = sys.executable; lpParameters = " ".join(sys.argv)
-    lpDirectory = os.getcwd(); nShowCmd = 1
-    try:
-        print(f"Attempting relaunch: {lpFile} {lpParameters}")
-        result = ctypes.windll.shell32.ShellExecuteW(None, lpVerb, lpFile, lpParameters, lpDirectory, nShowCmd)
-        print(f"ShellExecuteW result: {result}")
-        return result > 32
-    except Exception as e:
-        print(f"Relaunch error: {e}")
-        try: messagebox.showerror("Relaunch Error", f"Could not relaunch as admin:\n{e}")
-        except NameError: pass
-        return False
+EXTENSIONS_TO_FIND = (".webp", ".jfif", ".jif")
+# Perfiles de codificación PNG (velocidad vs tamaño). 'reduce_colors' pasa a paleta (y menor profundidad de bits)
+# las imágenes con <= 256 colores, sin pérdida; el resto son argumentos de Image.save
+ENCODING_PROFILES = {
+    "fast": {"compress_level": 1},
+    "balanced": {"compress_level": 6}, # Valores por defecto de Pillow
+    "smallest": {"compress_level": 9, "optimize": True, "reduce_colors": True},
+}
+DEFAULT_PROFILE = "balanced"
+DEFAULT_BACKGROUND = (255, 255, 255) # Fondo al aplanar la transparencia
+# Distribución de las salidas: carpeta plana (por nombre), espejo del árbol de origen, subcarpetas por hash
+# (ab/cd/nombre_<hash>.png) o junto al archivo de origen
+OUTPUT_LAYOUTS = ("flat", "mirror", "sharded", "inplace")
+DEFAULT_LAYOUT = "flat"
+# Imágenes animadas: APNG (duraciones y repeticiones), solo el primer fotograma o un PNG numerado por fotograma
+ANIMATION_MODES = ("apng", "first", "frames")
+DEFAULT_ANIMATION = "apng"
+
+
+# --- Reporters (progreso sin GUI) ---
+
+class Reporter:
+    """ Reporter base sin salida; misma interfaz que usa scan_and_convert de ImageConverterApp """
+    def __init__(self, progress_callback=None):
+        self.progress_callback = progress_callback
+        self.stop_scan_flag = threading.Event()
+
+    def log(self, message, tag='INFO'): pass
+
+    def update_progress_and_label(self, value, maximum):
+        if self.progress_callback: self.progress_callback(value, maximum)
+
+    def update_status_label(self, text): pass
+
+    def show_message(self, title, message, info=False, error=False, warning=False): pass
+
 
+class ConsoleReporter(Reporter):
+    """ Reporter para terminal: log a stderr y progreso cada `progress_every` archivos """
+    def __init__(self, progress_callback=None, quiet=False, progress_every=100, stream=None):
+        super().__init__(progress_callback)
+        self.quiet = quiet; self.progress_every = max(1, progress_every)
+        self.stream = stream or sys.stderr
 
-# --- Funciones de Conversión y Escaneo (Sin cambios) ---
-def convert_to_png(file_path, output_path_png, delete_original=False, app_instance=None):
-    """ Convierte imagen, loguea a app_instance.log """
+    def log(self, message, tag='INFO'):
+        tag = tag.upper()
+        if self.quiet and tag not in ('ERROR', 'WARN'): return
+        for line in message.strip('\n').splitlines() or ['']: print(f"[{tag}] {line}", file=self.stream)
+
+    def update_progress_and_label(self, value, maximum):
+        super().update_progress_and_label(value, maximum)
+        if not self.quiet and value and (value % self.progress_every == 0 or value == maximum):
+            print(f"[INFO] Processing: {value} / {maximum}", file=self.stream)
+
+
+class _LogBuffer:
+    """ Acumula mensajes de log (picklable) para devolverlos desde un worker """
+    def __init__(self): self.messages = []
+    def log(self, message, tag='INFO'): self.messages.append((message, tag.upper()))
+
+
+# --- Funciones de Conversión y Escaneo ---
+def _reduce_colors(img):
+    """ Pasa una imagen RGB con <= 256 colores a modo P sin pérdida; si no, o si la paleta no es exacta, la devuelve tal cual
+        (quantize busca el color más cercano de forma aproximada: el resultado se comprueba píxel a píxel) """
+    if img.mode != 'RGB': return img
+    colors = img.getcolors(256)
+    if colors is None: return img
+    reduced = img.quantize(colors=len(colors), method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+    return reduced if ImageChops.difference(img, reduced.convert('RGB')).getbbox() is None else img
+
+def _target_size(size, max_dimension):
+    """ Tamaño que cabe en max_dimension manteniendo la proporción, o None si la imagen ya cabe """
+    width, height = size; scale = max_dimension / max(width, height)
+    if scale >= 1: return None
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def _decode_scaled(img, max_dimension):
+    """ Decodifica img limitada a max_dimension: JPEG/JFIF usa draft() (escala DCT en libjpeg) y el resto un
+        reduce() entero previo; después un redimensionado LANCZOS al tamaño final """
+    target = _target_size(img.size, max_dimension) if max_dimension else None
+    if target is None: img.load(); return img
+    if img.format == 'JPEG': img.draft(None, target) # libjpeg decodifica a 1/2, 1/4 o 1/8 sin pasar por el tamaño completo
+    img.load()
+    if img.mode == 'P': img = img.convert('RGBA' if 'transparency' in img.info else 'RGB') # P solo admite NEAREST
+    if img.size != target: img = img.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    return img
+
+def has_alpha(img):
+    """ True si la imagen tiene transparencia (RGBA, LA o paleta con tRNS) """
+    return img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+
+def flatten_alpha(img, background=DEFAULT_BACKGROUND):
+    """ Compone img sobre un fondo sólido en una sola pasada: paste() usa la banda alfa de la propia imagen como
+        máscara, sin split() ni copias de bandas. Solo P+tRNS necesita una conversión previa a RGBA """
+    if img.mode == 'P': img = img.convert('RGBA')
+    flat = Image.new('RGB', img.size, background)
+    flat.paste(img, (0, 0), img)
+    return flat
+
+def save_png(img, output, profile=DEFAULT_PROFILE):
+    """ Guarda img como PNG (ruta o archivo binario) con los ajustes del perfil de codificación
+        Con reduce_colors la versión con paleta solo se usa si ocupa menos que la original """
+    settings = dict(ENCODING_PROFILES[profile])
+    reduced = _reduce_colors(img) if settings.pop('reduce_colors', False) else img
+    if reduced is img: img.save(output, "PNG", **settings); return
+    candidates = []
+    for candidate in (reduced, img):
+        png_buffer = io.BytesIO(); candidate.save(png_buffer, "PNG", **settings); candidates.append(png_buffer)
+    data = min(candidates, key=lambda png_buffer: png_buffer.tell()).getbuffer()
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, 'wb') as f: f.write(data)
+    else: output.write(data)
+
+def prepare_for_png(img, keep_alpha=False, background=DEFAULT_BACKGROUND, log_func=None, name="image"):
+    """ Modo final de una imagen decodificada: conserva o aplana la transparencia y pasa el resto a RGB
+        Compartido por convert_to_png (rutas) y convert_bytes_to_png (memoria) """
+    if has_alpha(img):
+        if keep_alpha: return img # PNG admite RGBA/LA/P+tRNS directamente
+        try: return flatten_alpha(img, background)
+        except Exception as paste_err:
+            if log_func: log_func(f"*** Warn: Transparency issue {name}: {paste_err}", 'WARN')
+            return img.convert('RGB')
+    return img if img.mode == 'RGB' else img.convert('RGB')
+
+def convert_bytes_to_png(source, output=None, profile=DEFAULT_PROFILE, max_dimension=None, keep_alpha=False,
+                         background=DEFAULT_BACKGROUND, log_func=None, stats=None, animation=DEFAULT_ANIMATION):
+    """ Convierte una imagen en memoria (bytes o archivo binario) y devuelve el PNG, o lo escribe en output """
+    if animation not in ("apng", "first"): raise ValueError(f"Unsupported animation mode for in-memory conversion: {animation!r}") # 'frames' escribe varios archivos
+    stages = {}; last_mark = time.perf_counter()
+    def mark(stage):
+        nonlocal last_mark
+        now = time.perf_counter(); stages[stage] = now - last_mark; last_mark = now
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        if stats is not None: stats['bytes_in'] = len(source)
+        source = io.BytesIO(source)
+    with Image.open(source) as source_img:
+        mark('open'); png_buffer = io.BytesIO()
+        if animation == "apng" and is_animated(source_img):
+            save_animation(source_img, png_buffer, profile, max_dimension, keep_alpha, background); mark('encode')
+        else:
+            img = _decode_scaled(source_img, max_dimension); mark('decode')
+            img = prepare_for_png(img, keep_alpha, background, log_func); mark('convert')
+            save_png(img, png_buffer, profile); mark('encode')
+    if stats is not None: stats['stages'] = stages; stats['bytes_out'] = png_buffer.tell()
+    if output is None: return png_buffer.getvalue()
+    output.write(png_buffer.getbuffer()) # Un solo write: vale también para sockets y streams no posicionables
+    return png_buffer.tell()
+
+def relative_key(path, root_directory):
+    """ Ruta relativa a la raíz del escaneo, con '/' como separador (estable entre SO y máquinas) """
+    return os.path.relpath(path, root_directory).replace(os.sep, '/')
+
+def stable_hash(text):
+    """ Hash hexadecimal estable (no depende de PYTHONHASHSEED) de un texto """
+    return hashlib.blake2b(text.encode('utf-8', 'surrogateescape'), digest_size=8).hexdigest()
+
+def in_shard(path, root_directory, shard):
+    """ True si el origen pertenece al shard (índice, total): stable_hash(relative_key) % total == índice """
+    return shard is None or int(stable_hash(relative_key(path, root_directory)), 16) % shard[1] == shard[0]
+
+class OutputSettings(collections.namedtuple('OutputSettings', 'layout profile max_dimension keep_alpha background animation variants',
+                                            defaults=(DEFAULT_LAYOUT, DEFAULT_PROFILE, None, False, DEFAULT_BACKGROUND, DEFAULT_ANIMATION, ()))):
+    """ Opciones que determinan los PNG de salida, compartidas por scan_and_convert y watch_and_convert """
+    __slots__ = ()
+
+    def key(self):
+        """ Huella estable de estas opciones (se guarda en índice y diario junto a cada origen) """
+        return stable_hash(repr((self.layout, self.profile, self.max_dimension or None, bool(self.keep_alpha), tuple(self.background),
+                                 self.animation, tuple(sorted(tuple(variant) for variant in self.variants)))))
+
+    def conversion_options(self):
+        """ Argumentos de convert_to_png (todo menos layout, que decide la ruta de salida) """
+        options = self._asdict(); del options['layout']; return options
+
+    def validate(self):
+        """ ValueError si alguna opción no es válida """
+        if self.profile not in ENCODING_PROFILES: raise ValueError(f"Unknown encoding profile: {self.profile!r}")
+        if self.layout not in OUTPUT_LAYOUTS: raise ValueError(f"Unknown output layout: {self.layout!r}")
+        if self.animation not in ANIMATION_MODES: raise ValueError(f"Unknown animation mode: {self.animation!r}")
+        if self.max_dimension is not None and self.max_dimension < 1: raise ValueError(f"max_dimension must be at least 1, got {self.max_dimension}")
+
+def output_path_for(path, root_directory, output_base_folder, layout=DEFAULT_LAYOUT):
+    """ Ruta del PNG para un origen según la distribución de salida (ver OUTPUT_LAYOUTS) """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if layout == "flat": return os.path.join(output_base_folder, stem + ".png")
+    if layout == "inplace": return os.path.splitext(path)[0] + ".png"
+    key = relative_key(path, root_directory)
+    if layout == "mirror": return os.path.join(output_base_folder, os.path.splitext(key)[0].replace('/', os.sep) + ".png")
+    if layout == "sharded":
+        digest = stable_hash(key) # Miles de archivos por carpeta como máximo, sin colisiones de nombre
+        return os.path.join(output_base_folder, digest[:2], digest[2:4], f"{stem}_{digest[:8]}.png")
+    raise ValueError(f"Unknown output layout: {layout!r}")
+
+def parse_variants(text):
+    """ 'thumb=256,icon=64' o '512,128' -> (('_thumb', 256), ('_icon', 64)) / (('_512', 512), ('_128', 128)) """
+    variants = []
+    for item in (part.strip() for part in text.split(',')):
+        if not item: continue
+        name, _, size = item.rpartition('=')
+        try: size = int(size)
+        except ValueError: raise ValueError(f"invalid variant size in {item!r}")
+        if size < 1: raise ValueError(f"variant size must be positive in {item!r}")
+        variants.append((f"_{name or size}", size))
+    return tuple(variants)
+
+def variant_path(output_path_png, suffix):
+    """ Ruta de una variante: nombre<sufijo>.png junto a la salida principal """
+    return f"{os.path.splitext(output_path_png)[0]}{suffix}.png"
+
+def render_variants(img, output_path_png, variants, profile=DEFAULT_PROFILE):
+    """ Codifica las variantes (sufijo, lado máximo) de una imagen ya decodificada, de la mayor a la menor: cada una se
+        redimensiona a partir de la anterior, sin volver a decodificar. Devuelve [(ruta, datos PNG)] para escribir """
+    current = img.convert('RGBA') if img.mode == 'P' else img # P solo admite NEAREST
+    outputs = []
+    for suffix, size in sorted(variants, key=lambda variant: -variant[1]):
+        target = _target_size(current.size, size)
+        if target: current = current.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        png_buffer = io.BytesIO(); save_png(current, png_buffer, profile)
+        outputs.append((variant_path(output_path_png, suffix), png_buffer.getbuffer()))
+    return outputs
+
+def is_animated(img):
+    """ True si la imagen tiene más de un fotograma (WebP/GIF animados) """
+    return getattr(img, 'is_animated', False) and getattr(img, 'n_frames', 1) > 1
+
+def is_animated_file(path):
+    """ is_animated leyendo solo la cabecera de path (False si no se puede abrir) """
+    try:
+        with Image.open(path) as img: return bool(is_animated(img))
+    except Exception: return False
+
+def frame_path(output_path_png, index):
+    """ Ruta del fotograma `index` (desde 0) en modo 'frames': nombre_0001.png, nombre_0002.png, ... """
+    return f"{os.path.splitext(output_path_png)[0]}_{index + 1:04d}.png"
+
+def iter_frames(img, max_dimension=None, keep_alpha=False, background=DEFAULT_BACKGROUND):
+    """ Produce (fotograma preparado, duración_ms) recorriendo la animación con ImageSequence, un fotograma a la vez
+        Todos salen en el mismo modo (RGBA con keep_alpha, si no RGB aplanado) y tamaño, como exige APNG """
+    target = _target_size(img.size, max_dimension) if max_dimension else None
+    for frame in ImageSequence.Iterator(img):
+        prepared = frame.convert('RGBA') # Decodifica el fotograma; WebP rellena info['duration'] al cargarlo
+        duration = frame.info.get('duration', 100)
+        if target: prepared = prepared.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        yield (prepared if keep_alpha else flatten_alpha(prepared, background)), duration
+
+def _animation_settings(profile):
+    """ Ajustes de Image.save por fotograma: sin reduce_colors (todos los fotogramas comparten IHDR, sin paleta común) """
+    return {key: value for key, value in ENCODING_PROFILES[profile].items() if key != 'reduce_colors'}
+
+def save_animation(img, output, profile=DEFAULT_PROFILE, max_dimension=None, keep_alpha=False, background=DEFAULT_BACKGROUND):
+    """ Codifica una imagen animada como APNG en output (archivo binario), conservando duraciones y número de
+        repeticiones; los fotogramas se decodifican y codifican de uno en uno. Devuelve el número de fotogramas """
+    return write_apng(iter_frames(img, max_dimension, keep_alpha, background), img.n_frames, output,
+                      loop=img.info.get('loop', 0), save_settings=_animation_settings(profile))
+
+def _convert_animation(img, output_path_png, animation, profile, max_dimension, keep_alpha, background, fsync, variants=()):
+    """ Salida de una imagen animada en convert_to_png: APNG atómico (y sus variantes, cada una con su propio recorrido
+        de fotogramas) o PNG numerados. Devuelve bytes escritos """
+    if animation == "apng":
+        bytes_out = 0
+        for path, limit in [(output_path_png, max_dimension)] + [(variant_path(output_path_png, suffix), min(size, max_dimension or size))
+                                                                 for suffix, size in variants]:
+            with atomic_output(path, fsync) as f: save_animation(img, f, profile, limit, keep_alpha, background); bytes_out += f.tell()
+        return bytes_out
+    bytes_out = 0; settings = _animation_settings(profile)
+    for index, (frame, _) in enumerate(iter_frames(img, max_dimension, keep_alpha, background)):
+        png_buffer = io.BytesIO(); frame.save(png_buffer, "PNG", **settings)
+        write_atomic(frame_path(output_path_png, index), png_buffer.getbuffer(), fsync); bytes_out += png_buffer.tell()
+    return bytes_out
+
+def convert_to_png(file_path, output_path_png, delete_original=False, app_instance=None, overwrite=False,
+                   profile=DEFAULT_PROFILE, stats=None, max_dimension=None, keep_alpha=False, background=DEFAULT_BACKGROUND,
+                   fsync=False, create_dirs=True, animation=DEFAULT_ANIMATION, variants=(), source_data=None, writer=None):
+    """ Convierte imagen, loguea a app_instance.log y devuelve 'converted', 'skipped' o 'error' (opciones en el README) """
     log_func = app_instance.log if app_instance else print
+    stages = {}; last_mark = time.perf_counter()
+    def mark(stage):
+        nonlocal last_mark
+        now = time.perf_counter(); stages[stage] = now - last_mark; last_mark = now
     try:
-        os.makedirs(os.path.dirname(output_path_png), exist_ok=True)
-        if os.path.exists(output_path_png): return 'skipped'
-        with Image.open(file_path) as img:
-            img_to_save = img
-            if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
-                 background = Image.new('RGB', img.size, (255, 255, 255))
-                 try:
-                     if img.mode == 'RGBA': mask = img.split()[3]
-                     elif img.mode == 'LA': mask = img.split()[1]
-                     elif 'transparency' in img.info: img_rgba = img.convert('RGBA'); mask = img_rgba.split()[3]
-                     else: mask = None
-                     if mask: background.paste(img, (0, 0), mask); img_to_save = background
-                     else: img_to_save = img.convert('RGB')
-                 except Exception as paste_err:
-                      log_func(f"*** Warn: Transparency issue {os.path.basename(file_path)}: {paste_err}", 'WARN')
-                      img_to_save = img.convert('RGB')
-            elif img.mode != 'RGB': img_to_save = img.convert('RGB')
-            img_to_save.save(output_path_png, "PNG")
+        if create_dirs: os.makedirs(os.path.dirname(output_path_png), exist_ok=True)
+        if not overwrite and all(os.path.exists(path) for path in [output_path_png] + [variant_path(output_path_png, s) for s, _ in variants]):
+            return 'skipped'
+        source = file_path if source_data is None else (io.BytesIO(source_data) if isinstance(source_data, bytes) else source_data)
+        source_img = Image.open(source); mark('open')
+        with source_img:
+            if animation != "first" and is_animated(source_img):
+                if animation == "frames" and not overwrite and os.path.exists(frame_path(output_path_png, 0)): return 'skipped'
+                bytes_out = _convert_animation(source_img, output_path_png, animation, profile, max_dimension, keep_alpha,
+                                               background, fsync or delete_original, variants); mark('encode')
+            else:
+                img = _decode_scaled(source_img, max_dimension); mark('decode') # Decodificar aquí para medir cada etapa aparte
+                img_to_save = prepare_for_png(img, keep_alpha, background, log_func, os.path.basename(file_path)); mark('convert')
+                png_buffer = io.BytesIO(); save_png(img_to_save, png_buffer, profile); mark('encode')
+                outputs = [(output_path_png, png_buffer.getbuffer())]
+                if variants: outputs += render_variants(img_to_save, output_path_png, variants, profile); mark('variants')
+                bytes_out = sum(len(data) for _, data in outputs)
+                if writer is not None:
+                    pending_write = writer.submit(outputs, fsync, file_path if delete_original else None)
+                    if stats is not None: stats['write_future'] = pending_write # El llamador espera la escritura (finish_job)
+                    else:
+                        for message, tag in pending_write.result()[1]: log_func(message, tag)
+                    delete_original = False # Lo hace el writer tras escribir
+                else:
+                    for path, data in outputs: write_atomic(path, data, fsync=fsync or delete_original)
+                mark('write')
+            if stats is not None:
+                stats['encode_time'] = stages['encode']; stats['stages'] = stages
+                stats['bytes_in'] = len(source_data) if source_data is not None else os.path.getsize(file_path); stats['bytes_out'] = bytes_out
             if delete_original:
                 try: os.remove(file_path)
                 except OSError as e: log_func(f"*** Error deleting {os.path.basename(file_path)}: {e}", 'ERROR')
             return 'converted'
-    except Image.UnidentifiedImageError: log_func(f"*** Error: Unidentified format: {os.path.basename(file_path)}", 'ERROR'); return 'error'
-    except PermissionError: log_func(f"*** Error: Permission denied saving {os.path.basename(output_path_png)}", 'ERROR'); return 'error'
-    except Exception as e: log_func(f"*** Error converting {os.path.basename(file_path)}: {e}", 'ERROR'); return 'error'
-
-def scan_and_convert(root_directory, output_base_folder, delete_originals=False, app_instance=None):
-    """ Escanea y convierte, actualizando UI con más detalle """
+    except Exception as e:
+        if stats is not None: stats['error_type'] = type(e).__name__; stats['stages'] = stages
+        if isinstance(e, Image.UnidentifiedImageError): log_func(f"*** Error: Unidentified format: {os.path.basename(file_path)}", 'ERROR')
+        elif isinstance(e, PermissionError): log_func(f"*** Error: Permission denied saving {os.path.basename(output_path_png)}", 'ERROR')
+        else: log_func(f"*** Error converting {os.path.basename(file_path)}: {e}", 'ERROR')
+        return 'error'
+
+def _convert_job(job):
+    """ Ejecuta un trabajo (file_path, output_path_png, delete_original, opciones) y devuelve (resultado, logs, stats) """
+    file_path, output_path_png, delete_original, options = job
+    buffer = _LogBuffer(); stats = {}
+    result = convert_to_png(file_path, output_path_png, delete_original, app_instance=buffer, stats=stats, **options)
+    return result, buffer.messages, stats
+
+def run_conversions(jobs, workers=1, executor_kind='process', stop_flag=None):
+    """ Convierte trabajos en serie o en un pool; produce (job, resultado, logs, stats) según van terminando
+        Un generador de trabajos puede producir None para indicar "nada listo todavía" (modo vigilancia):
+        así se entregan los resultados en curso mientras se espera por más trabajo """
+    stopped = lambda: stop_flag is not None and stop_flag.is_set()
+    if workers <= 1:
+        for job in jobs:
+            if stopped(): return
+            if job is not None: yield (job, *_convert_job(job))
+        return
+    pool_cls = ProcessPoolExecutor if executor_kind == 'process' else ThreadPoolExecutor
+    jobs = iter(jobs); pending = {}; max_in_flight = workers * 2 # Cola acotada: la cancelación es inmediata
+    exhausted = False; end = object()
+    with pool_cls(max_workers=workers) as pool:
+        try:
+            while True:
+                while not stopped() and not exhausted and len(pending) < max_in_flight:
+                    job = next(jobs, end)
+                    if job is end: exhausted = True; break
+                    if job is None: break
+                    pending[pool.submit(_convert_job, job)] = job
+                if stopped():
+                    for future in [f for f in pending if f.cancel()]: del pending[future]
+                if not pending:
+                    if exhausted or stopped(): return
+                    continue
+                done, _ = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = pending.pop(future)
+                    try: result, messages, stats = future.result()
+                    except Exception as e: result, messages, stats = 'error', [(f"*** Error converting {os.path.basename(job[0])}: {e}", 'ERROR')], {}
+                    yield job, result, messages, stats
+        finally:
+            for future in pending: future.cancel()
+
+def walk_matching_files(root_directory, extensions=EXTENSIONS_TO_FIND, log_func=print, stop_flag=None, status_func=None,
+                        rules=None, walk_workers=DEFAULT_WALK_WORKERS, metrics=None, format_filter=None, probe=None, shard=None):
+    """ Recorre root_directory (walker.walk_files) y produce las rutas cuyo nombre termina en una de las extensiones
+        Con format_filter (sniff.FormatFilter) la selección usa sus extensiones y su comprobación de cabecera.
+        probe(ruta) se llama en los hilos del walker para cada archivo aceptado (p. ej. leer sus dimensiones).
+        shard=(índice, total) deja solo los orígenes de ese shard (antes de leer cabeceras) """
+    format_filter = format_filter or FormatFilter(extensions=extensions)
+    permission_errors_count = 0; processed_folders = 0
+    def onerror_handler(err):
+        nonlocal permission_errors_count
+        permission_errors_count += 1
+        if permission_errors_count <= 10: log_func(f"--- Permission error accessing: {os.path.basename(err.filename or '')}", 'SKIP')
+        elif permission_errors_count == 11: log_func("--- (Further permission errors omitted)", 'SKIP')
+    def on_directory(current_folder, seconds):
+        nonlocal processed_folders
+        processed_folders += 1
+        if metrics is not None: metrics.observe_directory(seconds)
+        if status_func and processed_folders % 100 == 0: status_func(f"Scanning... (Folder: ...{os.path.basename(current_folder)})")
+    root = os.path.abspath(root_directory)
+    shard_check = (lambda path: in_shard(path, root, shard)) if shard else None
+    checks = [check for check in (shard_check, format_filter.accepts if format_filter.mode != "extension" else None, probe) if check]
+    accept = (lambda path: all(check(path) for check in checks)) if checks else None
+    yield from walk_files(root_directory, format_filter.matches_name, rules, walk_workers, onerror_handler, stop_flag, on_directory, accept)
+    if permission_errors_count > 0: log_func(f"--- Skipped {permission_errors_count} directories due to permissions.", 'SKIP')
+    if format_filter.rejected: log_func(f"--- Skipped {format_filter.rejected} files whose content is not a supported image.", 'SKIP')
+
+_WALK_DONE = object() # Centinela: el productor terminó de recorrer el árbol
+
+def _feed_queue(paths, work_queue, stop_flag, state):
+    """ Hilo productor: mete rutas en la cola acotada (bloquea si está llena) y marca el final con _WALK_DONE """
+    def put(item):
+        while not (stop_flag.is_set() or state['halt']):
+            try: work_queue.put(item, timeout=0.2); return True
+            except queue.Full: pass
+        return False
+    try:
+        for path in paths:
+            if not put(path): return
+            state['found'] += 1
+    except Exception as e: state['error'] = e
+    finally: state['walk_time'] = time.time() - state['start']; put(_WALK_DONE)
+
+def _has_pending_write(item):
+    """ True si el resultado (job, resultado, logs, stats) espera una escritura asíncrona """
+    return 'write_future' in item[3]
+
+def _drain_queue(work_queue, stop_flag, idle=False):
+    """ Consumidor: produce rutas de la cola hasta el centinela o hasta que se pida parar
+        Con idle=True produce None cuando la cola está vacía (el llamador puede hacer otra cosa mientras) """
+    while True:
+        try: item = work_queue.get(timeout=0.2)
+        except queue.Empty:
+            if stop_flag.is_set(): return
+            if idle: yield None
+            continue
+        if item is _WALK_DONE: return
+        yield item
+
+def scan_and_convert(root_directory, output_base_folder, delete_originals=False, app_instance=None, progress_callback=None,
+                     workers=1, executor_kind='process', queue_size=1000, walk_rules=None, walk_workers=DEFAULT_WALK_WORKERS,
+                     use_index=True, dedup=False, dedup_link_mode="hardlink", settings=None, metrics=None, use_journal=True,
+                     format_filter=None, memory_budget=None, shard=None, prefetch=0, io_buffer=DEFAULT_IO_BUFFER):
+    """ Escanea y convierte en streaming (opciones de salida en settings: OutputSettings), reportando a app_instance; devuelve el contador """
+    app_instance = app_instance or Reporter(progress_callback)
     log_func = app_instance.log; update_progress = app_instance.update_progress_and_label
-    update_status = app_instance.update_status_label; update_ui = app_instance.after
+    update_status = app_instance.update_status_label; stop_flag = app_instance.stop_scan_flag
     log_func(f"\nStarting scan in: {root_directory}", 'INFO')
     log_func(f"Output folder: {output_base_folder}", 'INFO')
     if delete_originals: log_func("Delete originals option is ON.", 'WARN')
+    if workers > 1: log_func(f"Parallel conversion: {workers} {executor_kind} workers.", 'INFO')
+    if shard is not None: log_func(f"Shard {shard[0]} of {shard[1]} (0-based).", 'INFO')
+    settings = settings or OutputSettings(); settings.validate()
+    if settings.layout != DEFAULT_LAYOUT: log_func(f"Output layout: {settings.layout}.", 'INFO')
+    root_abs = os.path.abspath(root_directory); created_dirs = set()
+    if settings.max_dimension: log_func(f"Resizing outputs to at most {settings.max_dimension}px.", 'INFO')
+    encode_totals = {'files': 0, 'bytes_in': 0, 'bytes_out': 0, 'encode_time': 0.0}
     counter = {'converted': 0, 'skipped': 0, 'error': 0, 'processed': 0}
-    extensions_to_find = (".webp", ".jfif", ".jif"); files_to_process = []
-    permission_errors_count = 0
-    update_status("Counting files..."); update_ui(1, lambda: None)
-    processed_folders = 0; start_time_count = time.time()
-    try:
-        def onerror_handler(err):
-            nonlocal permission_errors_count
-            if isinstance(err, OSError):
-                permission_errors_count += 1
-                if permission_errors_count <= 10: log_func(f"--- Permission error accessing: {os.path.basename(err.filename)}", 'SKIP')
-                elif permission_errors_count == 11: log_func("--- (Further permission errors omitted)", 'SKIP')
-            else: log_func(f"*** OS Walk Error: {err} ***", 'ERROR')
-        for current_folder, _, files in os.walk(root_directory, topdown=True, onerror=onerror_handler):
-             if app_instance and app_instance.stop_scan_flag.is_set(): log_func("Scan stopped during counting.", "WARN"); return
-             processed_folders += 1
-             if processed_folders % 100 == 0: update_status(f"Counting... (Folder: ...{os.path.basename(current_folder)})"); update_ui(1, lambda: None)
-             for filename in files:
-                  if filename.lower().endswith(extensions_to_find): files_to_process.append(os.path.join(current_folder, filename))
-        if permission_errors_count > 0: log_func(f"--- Skipped {permission_errors_count} directories due to permissions.", 'SKIP')
-    except Exception as e: log_func(f"\n*** Error counting files: {e} ***", 'ERROR'); app_instance.show_message("Scan Error", f"Error counting files:\n{e}", error=True); return
-    finally: update_status("")
-    count_time = time.time() - start_time_count; total_files = len(files_to_process)
-    log_func(f"Count finished in {count_time:.2f}s. Found {total_files} files.", 'INFO')
-    update_progress(0, total_files); update_ui(1, lambda: None)
-    if total_files == 0: log_func("No matching files found.", 'INFO'); app_instance.show_message("Scan Complete", "No matching files found.", info=True); return
-    update_status("Converting images..."); start_time_convert = time.time()
+    state = {'found': 0, 'error': None, 'start': time.time(), 'walk_time': None, 'halt': False}
+    work_queue = queue.Queue(maxsize=max(1, queue_size))
+    rules = (walk_rules or WalkRules()).excluding(output_base_folder)
+    scheduler = BudgetScheduler(memory_budget, queue_size, settings.max_dimension) if memory_budget else None
+    if scheduler is not None: log_func(f"Memory budget: {memory_budget / 1048576:.0f} MB (largest images first).", 'INFO')
+    paths = walk_matching_files(root_directory, EXTENSIONS_TO_FIND, log_func, stop_flag, update_status, rules, walk_workers, metrics,
+                                format_filter, scheduler.probe if scheduler else None, shard)
+    walker = threading.Thread(target=_feed_queue, args=(paths, work_queue, stop_flag, state), daemon=True)
+    index = None; source_stats = {}; unchanged_count = 0; walk_logged = False; manifest = None
+    settings_key = settings.key(); conversion_options = settings.conversion_options()
+    if shard is not None:
+        try: manifest = ShardManifest(output_base_folder, shard, root_directory)
+        except OSError as e: log_func(f"*** Warn: Shard manifest unavailable, results cannot be merged: {e}", 'WARN')
+    if use_index:
+        try: index = ConversionIndex(output_base_folder, shard_file_name(INDEX_FILE_NAME, shard))
+        except (OSError, sqlite3.Error) as e: log_func(f"*** Warn: Conversion index unavailable, converting without it: {e}", 'WARN')
+    def handle_result(result, messages, path=None, stats=None):
+        nonlocal walk_logged
+        if metrics is not None: metrics.observe_file(path, result, stats or {}); metrics.maybe_write()
+        for message, tag in messages: log_func(message, tag)
+        if not walk_logged and state['walk_time'] is not None:
+            walk_logged = True; log_func(f"Walk finished in {state['walk_time']:.2f}s. Found {state['found']} files.", 'INFO')
+        counter['processed'] += 1; update_progress(counter['processed'], state['found'])
+        if result in counter: counter[result] += 1
+        if manifest is not None and path is not None: manifest.record(relative_key(path, root_abs), result)
+        if scheduler is not None:
+            scheduler.finish(path); line = scheduler.progress_line()
+            if line: log_func(line, 'INFO')
+    journal = None; resumed_count = 0; run_complete = False
+    if use_journal:
+        try: journal = JobJournal(output_base_folder, shard_file_name(JOURNAL_FILE_NAME, shard))
+        except OSError as e: log_func(f"*** Warn: Job journal unavailable, scan will not be resumable: {e}", 'WARN')
+        if journal is not None and journal.completed: log_func(f"Resuming interrupted scan: {len(journal.completed)} files already done.", 'INFO')
+    tracker = None; job_digests = {}; waiting_options = {}
+    if dedup:
+        try: tracker = DedupTracker(os.path.join(output_base_folder, shard_file_name(DEDUP_REPORT_FILE_NAME, shard)), dedup_link_mode,
+                                    lambda output_path: [variant_path(output_path, suffix) for suffix, _ in settings.variants])
+        except OSError as e: log_func(f"*** Warn: Dedup report unavailable, converting without dedup: {e}", 'WARN')
+    def finish_duplicate(digest, path, output_path_png, options):
+        try: result = tracker.materialize(digest, path, output_path_png, options.get('overwrite', False), fsync=delete_originals)
+        except OSError as e: log_func(f"*** Error linking duplicate {os.path.basename(path)}: {e}", 'ERROR'); result = 'error'
+        messages = [(f"*** Error: {os.path.basename(path)} duplicates a source that failed to convert", 'ERROR')] if result == 'error' else []
+        if result == 'converted' and delete_originals:
+            try: os.remove(path)
+            except OSError as e: messages.append((f"*** Error deleting {os.path.basename(path)}: {e}", 'ERROR'))
+        st = source_stats.pop(path, None)
+        if st is not None and result in ('converted', 'skipped'): index.record(path, st, output_path_png, settings_key)
+        if journal is not None and result in ('converted', 'skipped'): journal.record(path, result, output_path_png, settings_key)
+        handle_result(result, messages, path)
+    def candidates():
+        """ (ruta, salida, opciones) de los orígenes que hay que convertir (journal e índice ya consultados) """
+        nonlocal unchanged_count, resumed_count
+        for path in _drain_queue(work_queue, stop_flag, idle=scheduler is not None):
+            if path is None: yield None; continue
+            output_path_png = output_path_for(path, root_abs, output_base_folder, settings.layout); options = {}
+            if journal is not None and journal.completed.get(path) == (output_path_png, settings_key): # Misma salida y opciones
+                resumed_count += 1; handle_result('skipped', (), path); continue
+            if index is not None:
+                try: st = os.stat(path)
+                except OSError: st = None
+                row = index.lookup(path) if st else None
+                if row is not None and row[2] == output_path_png: # Con otra distribución de salida es un origen nuevo
+                    if row[0] == st.st_size and row[1] == st.st_mtime_ns and row[3] == settings_key:
+                        unchanged_count += 1; handle_result('skipped', (), path); continue
+                    options['overwrite'] = True # Origen modificado u opciones de salida distintas desde la última conversión
+                if st: source_stats[path] = st
+            output_dir = os.path.dirname(output_path_png); options['create_dirs'] = False
+            if output_dir not in created_dirs: # Una sola llamada a makedirs por carpeta de salida
+                try: os.makedirs(output_dir, exist_ok=True)
+                except OSError: options['create_dirs'] = True # Que convert_to_png reporte el error
+                else: created_dirs.add(output_dir)
+            yield path, output_path_png, options
+    def dedup_digest(item):
+        """ Hash del origen (en los hilos de map_ahead); None si es ilegible (convert_to_png reportará el error) o es
+            una animación en modo 'frames', sin salida principal que enlazar """
+        try: return None if settings.animation == "frames" and is_animated_file(item[0]) else hash_file(item[0])
+        except OSError: return None
+    def make_jobs():
+        # Con dedup los orígenes se leen y hashean en un pool por delante (map_ahead), no en este hilo despachador
+        items = map_ahead(candidates(), dedup_digest, HASH_WORKERS) if tracker is not None else ((item, None) if item else None for item in candidates())
+        for entry in items:
+            if entry is None: yield None; continue
+            (path, output_path_png, options), digest = entry
+            if digest is not None:
+                status, _ = tracker.claim(digest, path, output_path_png)
+                if status == DedupTracker.DUPLICATE: finish_duplicate(digest, path, output_path_png, options); continue
+                if status == DedupTracker.WAITING: waiting_options[path] = options; continue
+                job_digests[path] = digest
+            options.update(conversion_options)
+            if writer is not None: options['writer'] = writer
+            yield path, output_path_png, delete_originals, options
+    def finish_job(job, result, messages, stats):
+        future = stats.pop('write_future', None)
+        if future is not None: # Escritura asíncrona: el resultado cuenta cuando el PNG está en disco
+            try: seconds, write_messages = future.result(); stats['stages']['write'] = seconds; messages = list(messages) + write_messages
+            except Exception as e:
+                result = 'error'; stats['error_type'] = type(e).__name__
+                messages = list(messages) + [(f"*** Error writing {os.path.basename(job[1])}: {e}", 'ERROR')]
+        if 'encode_time' in stats:
+            encode_totals['files'] += 1
+            for key in ('bytes_in', 'bytes_out', 'encode_time'): encode_totals[key] += stats[key]
+        st = source_stats.pop(job[0], None)
+        if st is not None and result in ('converted', 'skipped'): index.record(job[0], st, job[1], settings_key)
+        if journal is not None and result in ('converted', 'skipped'): journal.record(job[0], result, job[1], settings_key)
+        handle_result(result, messages, job[0], stats)
+        digest = job_digests.pop(job[0], None)
+        if digest is not None:
+            for dup_path, dup_output in tracker.resolve(digest, result):
+                finish_duplicate(digest, dup_path, dup_output, waiting_options.pop(dup_path, {}))
+    in_process = workers <= 1 or executor_kind == 'thread' # mmap y writer solo sirven si la conversión corre en este proceso
+    prefetcher = Prefetcher(prefetch, io_buffer, use_mmap=in_process) if prefetch else None
+    writer = AsyncWriter(write_atomic, max_bytes=io_buffer) if prefetch and in_process else None
+    pending_writes = collections.deque()
+    if prefetcher is not None:
+        log_func(f"I/O pipeline: read-ahead {prefetch} files, {io_buffer / 1048576:.0f} MB buffer"
+                 + (", asynchronous writes." if writer else " (writes stay in the worker processes)."), 'INFO')
+    update_status("Scanning and converting..."); walker.start()
     try:
-        for i, original_full_path in enumerate(files_to_process):
-             if app_instance and app_instance.stop_scan_flag.is_set(): log_func("Scan stopped during conversion.", "WARN"); break
-             counter['processed'] = i + 1; update_progress(counter['processed'], total_files)
-             if counter['processed'] % 20 == 0 or counter['processed'] == total_files: update_ui(1, lambda: None)
-             result = convert_to_png(original_full_path, os.path.join(output_base_folder, os.path.basename(original_full_path).rsplit('.', 1)[0] + ".png"), delete_originals, app_instance=app_instance)
-             if result in counter: counter[result] += 1
+        jobs = scheduler.schedule(make_jobs()) if scheduler is not None else make_jobs()
+        if prefetcher is not None: jobs = prefetcher.prefetch(jobs)
+        for item in run_conversions(jobs, workers, executor_kind, stop_flag):
+            if scheduler is not None: scheduler.release(item[0][0]) # Sin esperar a la escritura asíncrona: schedule() no se bloquea
+            pending_writes.append(item)
+            while pending_writes and (not _has_pending_write(pending_writes[0]) or pending_writes[0][3]['write_future'].done()):
+                finish_job(*pending_writes.popleft())
+        while pending_writes: finish_job(*pending_writes.popleft()) # Espera a las escrituras asíncronas restantes
+        if stop_flag.is_set(): log_func("Scan stopped during conversion.", "WARN")
+        run_complete = not stop_flag.is_set() and state['error'] is None
     except Exception as e: log_func(f"\n*** Error during conversion: {e} ***", 'ERROR'); log_func("*** Scan may be incomplete. ***", 'ERROR'); app_instance.show_message("Scan Error", f"Error during conversion:\n{e}", error=True)
-    finally: update_status("")
-    convert_time = time.time() - start_time_convert; update_ui(1, lambda: None)
-    if not (app_instance and app_instance.stop_scan_flag.is_set()):
-        summary = (f"\n--- Scan Finished ({convert_time:.2f}s) ---\n"
-                   f"Processed: {counter['processed']} | Converted: {counter['converted']} | Skipped: {counter['skipped']} | Errors: {counter['error']}\n")
-        summary += f"Output: {output_base_folder}\n"; summary += "Originals " + ("deleted." if delete_originals else "kept.")
-        log_func(summary, 'INFO'); app_instance.show_message("Scan Complete", summary.strip(), info=True)
-
-
-# --- GUI Application Class (CustomTkinter) ---
-
-class ImageConverterApp(ctk.CTk):
-    def __init__(self):
-        super().__init__()
-
-        self.title("Image Converter")
-        self.geometry("800x650")
-        self.minsize(700, 600)
-
-        # --- Colores ---
-        self.DARK_BG = '#2b2b2b'; self.DARK_BG_FRAME = '#383838'; self.DARK_FG = '#dcdcdc'
-        self.DARK_FG_DISABLED = '#888888'; self.DARK_SELECT_BG = '#4f4f4f'; self.ACCENT_COLOR = '#0078d4'
-        self.DARK_BUTTON = '#4a4a4a'; self.DARK_BUTTON_ACCENT = '#005a9e'; self.ERROR_COLOR = '#f44336'
-        self.WARN_COLOR = '#ff9800'; self.SUCCESS_COLOR = '#4CAF50'; self.SKIP_COLOR = '#aaaaaa'
-        self.DARK_ENTRY_BG = '#3c3c3c'; self.DARK_BORDER = '#555555'
-        self.ADMIN_COLOR = self.WARN_COLOR
-
-        # --- Configurar tema y apariencia ---
-        ctk.set_appearance_mode("Dark")
-        ctk.set_default_color_theme("blue")
-
-        # --- Variables ---
-        self.scan_option = tk.StringVar(value="current")
-        self.specific_dir = tk.StringVar(value="")
-        self.delete_originals_var = tk.BooleanVar(value=False)
-        self.script_dir = self.get_script_directory() # Usar función auxiliar
-        self.output_folder_path = os.path.join(self.script_dir, OUTPUT_FOLDER_NAME)
-        self.is_currently_admin = is_admin()
-
-        # --- Establecer Icono de Ventana ---
-        self.setup_window_icon()
-
-        # --- Cargar Iconos para Botones ---
-        self.icons = {}
-        self.load_button_icons()
-
-        # --- Layout Principal (Grid) ---
-        self.grid_columnconfigure(0, weight=1)
-        self.grid_rowconfigure(0, weight=0); self.grid_rowconfigure(1, weight=0)
-        self.grid_rowconfigure(2, weight=1); self.grid_rowconfigure(3, weight=0)
-        self.grid_rowconfigure(4, weight=0)
-
-        # --- Frame Opciones ---
-        options_frame = ctk.CTkFrame(self, corner_radius=10)
-        options_frame.grid(row=0, column=0, padx=20, pady=(20, 10), sticky="ew")
-        options_frame.grid_columnconfigure(1, weight=1)
-        options_label = ctk.CTkLabel(options_frame, text="1. Select Scan Location", font=ctk.CTkFont(size=14, weight="bold"))
-        options_label.grid(row=0, column=0, columnspan=2, padx=15, pady=(10, 15), sticky="w")
-        self.rb_current = ctk.CTkRadioButton(options_frame, text=f"Current Directory ({os.path.basename(self.script_dir)})",
-                                             variable=self.scan_option, value="current", command=self.update_ui_state)
-        self.rb_current.grid(row=1, column=0, columnspan=2, padx=20, pady=5, sticky="w")
-        self.rb_specific = ctk.CTkRadioButton(options_frame, text="Specific Directory:",
-                                              variable=self.scan_option, value="specific", command=self.update_ui_state)
-        self.rb_specific.grid(row=2, column=0, padx=(20, 5), pady=5, sticky="w")
-        specific_dir_subframe = ctk.CTkFrame(options_frame, fg_color="transparent")
-        specific_dir_subframe.grid(row=2, column=1, padx=(0, 15), pady=0, sticky="ew")
-        specific_dir_subframe.grid_columnconfigure(0, weight=1)
-        self.specific_dir_entry = ctk.CTkEntry(specific_dir_subframe, textvariable=self.specific_dir,
-                                               placeholder_text="Path to directory...", state=tk.DISABLED, corner_radius=8)
-        self.specific_dir_entry.grid(row=0, column=0, padx=(0, 10), sticky="ew")
-        self.browse_button = ctk.CTkButton(specific_dir_subframe, text="Browse", width=85,
-                                           image=self.icons.get("browse"), compound="left",
-                                           command=self.browse_directory, state=tk.DISABLED, corner_radius=8)
-        self.browse_button.grid(row=0, column=1, sticky="w")
-        self.rb_full = ctk.CTkRadioButton(options_frame, text="Full System/Drive (Requires Admin)",
-                                          variable=self.scan_option, value="full", command=self.update_ui_state)
-        self.rb_full.grid(row=3, column=0, columnspan=2, padx=20, pady=(5, 10), sticky="w")
-
-        # --- Frame Opciones Adicionales ---
-        extra_options_frame = ctk.CTkFrame(self, fg_color="transparent")
-        extra_options_frame.grid(row=1, column=0, padx=20, pady=5, sticky="ew")
-        extra_options_frame.columnconfigure(1, weight=1)
-        delete_label = ctk.CTkLabel(extra_options_frame, text="2. Options", font=ctk.CTkFont(size=14, weight="bold"))
-        delete_label.grid(row=0, column=0, columnspan=2, padx=0, pady=(10, 5), sticky="w")
-        self.delete_check = ctk.CTkCheckBox(extra_options_frame, text="Delete original files after conversion",
-                                            variable=self.delete_originals_var, checkbox_width=18, checkbox_height=18, corner_radius=5)
-        self.delete_check.grid(row=1, column=0, columnspan=2, padx=0, pady=5, sticky="w")
-        output_label = ctk.CTkLabel(extra_options_frame, text="Output Folder:", anchor="w")
-        output_label.grid(row=2, column=0, padx=0, pady=(5, 10), sticky="w")
-        self.output_path_label = ctk.CTkLabel(extra_options_frame, text=self.output_folder_path, anchor="w", text_color=self.SKIP_COLOR, font=ctk.CTkFont(size=11))
-        self.output_path_label.grid(row=2, column=1, padx=5, pady=(5, 10), sticky="ew")
-
-        # --- Frame Log ---
-        log_frame = ctk.CTkFrame(self, corner_radius=10)
-        log_frame.grid(row=2, column=0, padx=20, pady=10, sticky="nsew")
-        log_frame.grid_rowconfigure(1, weight=1); log_frame.grid_columnconfigure(0, weight=1)
-        log_label = ctk.CTkLabel(log_frame, text="Log Output", font=ctk.CTkFont(weight="bold"))
-        log_label.grid(row=0, column=0, padx=15, pady=(10, 5), sticky="w")
-        self.log_textbox = ctk.CTkTextbox(log_frame, wrap=tk.WORD, corner_radius=8, border_width=1,
-                                          font=ctk.CTkFont(family="Consolas", size=11), activate_scrollbars=True)
-        self.log_textbox.grid(row=1, column=0, padx=15, pady=(0, 15), sticky="nsew")
-        self.log_textbox.configure(state="disabled")
-        info_fg_color = self.DARK_FG if ctk.get_appearance_mode() == "Dark" else "#000000"
-        self.log_textbox.tag_config("INFO", foreground=info_fg_color)
-        self.log_textbox.tag_config("ERROR", foreground=self.ERROR_COLOR)
-        self.log_textbox.tag_config("WARN", foreground=self.WARN_COLOR)
-        self.log_textbox.tag_config("SUCCESS", foreground=self.SUCCESS_COLOR)
-        self.log_textbox.tag_config("SKIP", foreground=self.SKIP_COLOR)
-
-        # --- Frame Acciones ---
-        action_frame = ctk.CTkFrame(self, fg_color="transparent")
-        action_frame.grid(row=3, column=0, padx=20, pady=(10, 5), sticky="ew")
-        action_frame.grid_columnconfigure(0, weight=1)
-        button_subframe = ctk.CTkFrame(action_frame, fg_color="transparent")
-        button_subframe.grid(row=0, column=0, pady=(0, 10))
-        self.start_button = ctk.CTkButton(button_subframe, text="Start Scan", image=self.icons.get("start"), compound="left",
-                                          command=self.start_scan_thread, height=40,
-                                          font=ctk.CTkFont(size=13, weight="bold"), corner_radius=8)
-        self.start_button.grid(row=0, column=0, padx=10)
-        self.stop_button = ctk.CTkButton(button_subframe, text="Stop Scan", image=self.icons.get("stop"), compound="left",
-                                         command=self.stop_scan, height=40,
-                                         font=ctk.CTkFont(size=13, weight="bold"), corner_radius=8,
-                                         fg_color=self.WARN_COLOR, hover_color="#cc7a00", state=tk.DISABLED)
-        self.stop_button.grid(row=0, column=1, padx=10)
-        progress_status_frame = ctk.CTkFrame(action_frame, fg_color="transparent")
-        progress_status_frame.grid(row=1, column=0, sticky="ew", pady=(5,0))
-        progress_status_frame.grid_columnconfigure(0, weight=1)
-        progress_status_frame.grid_columnconfigure(1, weight=0)
-        self.status_label = ctk.CTkLabel(progress_status_frame, text="", anchor="w", font=ctk.CTkFont(size=11), text_color=self.SKIP_COLOR)
-        self.status_label.grid(row=0, column=0, padx=(5, 10), sticky="ew")
-        self.progress_bar = ctk.CTkProgressBar(progress_status_frame, orientation="horizontal", height=10, corner_radius=5, width=200)
-        self.progress_bar.grid(row=0, column=1, sticky="e")
-        self.progress_bar.set(0)
-
-        # --- Frame Admin Status ---
-        admin_frame = ctk.CTkFrame(self, fg_color="transparent")
-        admin_frame.grid(row=4, column=0, padx=20, pady=(0, 10), sticky="e")
-        admin_text = "Administrator Privileges: Active" if self.is_currently_admin else "Standard User Privileges"
-        admin_color = self.ADMIN_COLOR if self.is_currently_admin else self.SKIP_COLOR
-        admin_icon = self.icons.get("shield") if self.is_currently_admin else None
-        self.admin_status_label = ctk.CTkLabel(admin_frame, text=admin_text, image=admin_icon, compound="left",
-                                               font=ctk.CTkFont(size=10), text_color=admin_color)
-        self.admin_status_label.pack()
-
-        # --- Inicialización Final ---
-        self.log(f"Script location: {self.script_dir}", 'INFO')
-        self.log(f"Output folder: {self.output_folder_path}", 'INFO')
-        self.log(f"Running with: {admin_text}", 'INFO')
-        self.log("Select scan location and press 'Start Scan'.", 'INFO')
-        self.update_ui_state()
-
-        self.protocol("WM_DELETE_WINDOW", self.on_closing)
-        self.scan_thread = None
-        self.stop_scan_flag = threading.Event()
-
-    # --- Métodos de la GUI (adaptados a CTk y UX) ---
-
-    def get_script_directory(self):
-        """ Determina el directorio base del script o ejecutable """
-        if getattr(sys, 'frozen', False):
-            # Si está congelado (empaquetado por PyInstaller)
-            return os.path.dirname(sys.executable)
-        else:
-            # Si se ejecuta como script .py
-            return os.path.dirname(os.path.abspath(__file__))
-
-    def resource_path(self, relative_path):
-        """ Obtiene la ruta absoluta a un recurso, funciona para dev y para PyInstaller """
-        try:
-            # PyInstaller crea una carpeta temporal y guarda la ruta en _MEIPASS
-            base_path = sys._MEIPASS
-        except Exception:
-            # Si no está congelado, usar la ruta del script
-            base_path = self.script_dir # Usar el atributo ya calculado
-
-        return os.path.join(base_path, relative_path)
-
-
-    def setup_window_icon(self):
-        """ Establece el icono de la ventana principal si el archivo .ico existe """
-        try:
-            # Usar resource_path para encontrar el icono
-            icon_path = self.resource_path(APP_ICON_FILE)
-            if os.path.exists(icon_path):
-                # self.iconbitmap() es un método de la ventana raíz (CTk)
-                self.iconbitmap(icon_path)
-                print(f"Window icon set from: {icon_path}")
-            else:
-                print(f"Warning: Window icon file not found at expected path: {icon_path}")
-                print(f"         (Looking relative to base path: {self.script_dir if '_MEIPASS' not in sys.__dict__ else sys._MEIPASS})")
-        except Exception as e:
-            print(f"Warning: Could not set window icon: {e}")
-
-
-    def load_button_icons(self):
-        """ Carga los iconos para los botones """
-        icon_size = (18, 18)
-        icon_files = {"browse": "browse_icon.png", "start": "start_icon.png", "stop": "stop_icon.png", "shield": "shield_icon.png"}
-        for name, filename in icon_files.items():
-            try:
-                # Usar resource_path para encontrar los iconos PNG
-                icon_path = self.resource_path(filename)
-                if os.path.exists(icon_path):
-                    # Usar CTkImage para mejor escalado y soporte de temas (opcional)
-                    # img = ctk.CTkImage(light_image=Image.open(icon_path),
-                    #                    dark_image=Image.open(icon_path), # Mismo icono para ambos modos
-                    #                    size=icon_size)
-                    # self.icons[name] = img
-                    # O seguir con ImageTk si CTkImage da problemas
-                    img_pil = Image.open(icon_path).resize(icon_size)
-                    self.icons[name] = ImageTk.PhotoImage(img_pil)
-
-                else: print(f"Warning: Button icon file not found: {filename} at {icon_path}")
-            except Exception as e: print(f"Warning: Could not load button icon {filename}: {e}")
-
-    # ... (resto de métodos sin cambios: center_window, log, _insert_log, etc.) ...
-    def center_window(self, width=800, height=650):
-        """ Centra la ventana en la pantalla """
-        try:
-            self.update_idletasks(); screen_width = self.winfo_screenwidth()
-            screen_height = self.winfo_screenheight(); center_x = max(0, int(screen_width/2 - width / 2))
-            center_y = max(0, int(screen_height/2 - height / 2))
-            self.geometry(f'{width}x{height}+{center_x}+{center_y}')
-        except Exception as e: print(f"Could not center window: {e}"); self.geometry(f"{width}x{height}")
-
-    def log(self, message, tag='INFO'):
-        """ Añade mensaje al CTkTextbox (thread-safe) """
-        tag_upper = tag.upper(); self.after(0, self._insert_log, message, tag_upper)
+    finally:
+        state['halt'] = True; walker.join(timeout=1); update_status("")
+        if writer is not None: writer.close()
+        if index is not None: index.close()
+        if journal is not None: journal.close(finished=run_complete)
+        if manifest is not None:
+            try: manifest.close(counter, run_complete); log_func(f"Shard manifest: {manifest.path}", 'INFO')
+            except OSError as e: log_func(f"*** Warn: Could not write shard manifest: {e}", 'WARN')
+        if resumed_count: log_func(f"Journal: {resumed_count} files completed by the interrupted run skipped.", 'SKIP')
+        if metrics is not None:
+            try: metrics.write(finished=True)
+            except OSError as e: log_func(f"*** Warn: Could not write metrics: {e}", 'WARN')
+        if tracker is not None:
+            tracker.close()
+            log_func(f"Dedup: {len(tracker.entries)} unique sources, {tracker.duplicates} duplicates reused "
+                     f"({tracker.bytes_reused / 1048576:.1f} MB not re-encoded).", 'INFO')
+        if unchanged_count: log_func(f"Index: {unchanged_count} unchanged sources skipped.", 'SKIP')
+    total_time = time.time() - state['start']
+    if state['error'] is not None:
+        log_func(f"\n*** Error scanning files: {state['error']} ***", 'ERROR'); log_func("*** Scan may be incomplete. ***", 'ERROR')
+        app_instance.show_message("Scan Error", f"Error scanning files:\n{state['error']}", error=True); return counter
+    if stop_flag.is_set(): return counter
+    if not walk_logged and state['walk_time'] is not None: log_func(f"Walk finished in {state['walk_time']:.2f}s. Found {state['found']} files.", 'INFO')
+    if state['found'] == 0: update_progress(0, 0); log_func("No matching files found.", 'INFO'); app_instance.show_message("Scan Complete", "No matching files found.", info=True); return counter
+    summary = (f"\n--- Scan Finished ({total_time:.2f}s) ---\n"
+               f"Processed: {counter['processed']} | Converted: {counter['converted']} | Skipped: {counter['skipped']} | Errors: {counter['error']}\n")
+    if encode_totals['files']:
+        ratio = encode_totals['bytes_out'] / max(1, encode_totals['bytes_in']) * 100
+        summary += (f"Encoding ({settings.profile}): {encode_totals['files']} files, {encode_totals['bytes_in'] / 1048576:.1f} MB in -> "
+                    f"{encode_totals['bytes_out'] / 1048576:.1f} MB out ({ratio:.0f}%), encode {encode_totals['encode_time']:.2f}s\n")
+    if scheduler is not None: summary += f"Scheduler: peak memory estimate {scheduler.peak_in_use / 1048576:.0f} MB of {memory_budget / 1048576:.0f} MB budget\n"
+    summary += f"Output: {output_base_folder}\n"; summary += "Originals " + ("deleted." if delete_originals else "kept.")
+    log_func(summary, 'INFO'); app_instance.show_message("Scan Complete", summary.strip(), info=True)
+    return counter
+
+
+# --- CLI (sin GUI) ---
+
+def _positive_int(text):
+    """ Entero >= 1 para argparse """
+    try: value = int(text)
+    except ValueError: raise argparse.ArgumentTypeError(f"expected a positive integer, got {text!r}")
+    if value < 1: raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+def _variants_arg(text):
+    """ parse_variants para argparse """
+    try: return parse_variants(text)
+    except ValueError as e: raise argparse.ArgumentTypeError(str(e))
+
+def build_arg_parser():
+    """ Parser de argumentos para el modo de línea de comandos """
+    parser = argparse.ArgumentParser(prog="converter", description="Convert WebP/JFIF images to PNG without the GUI.")
+    parser.add_argument("root_directory", help="Directory to scan recursively")
+    parser.add_argument("-o", "--output", help=f"Output folder (default: ./{OUTPUT_FOLDER_NAME})")
+    parser.add_argument("--delete-originals", action="store_true", help="Delete source files after a successful conversion")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="Parallel conversion workers (0 = one per CPU core)")
+    parser.add_argument("--executor", choices=("process", "thread"), default="process", help="Pool type used when --workers > 1")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB", help="Skip directories/files matching GLOB (repeatable)")
+    parser.add_argument("--no-default-excludes", action="store_true", help="Also descend into .git, node_modules, /proc, /sys, ...")
+    parser.add_argument("--max-depth", type=int, help="Maximum directory depth below the root (0 = root only)")
+    parser.add_argument("--one-file-system", action="store_true", help="Do not cross into other mounted filesystems")
+    parser.add_argument("--walk-workers", type=int, default=DEFAULT_WALK_WORKERS, help="Threads listing directories in parallel")
+    parser.add_argument("--no-index", action="store_true", help="Do not use the incremental conversion index in the output folder")
+    parser.add_argument("--dedup", action="store_true", help="Encode byte-identical sources once and link the duplicates")
+    parser.add_argument("--dedup-link", choices=LINK_MODES, default="hardlink", help="How duplicate outputs are created")
+    parser.add_argument("--profile", choices=tuple(ENCODING_PROFILES), default=DEFAULT_PROFILE, help="PNG encoding profile (speed vs size)")
+    parser.add_argument("--max-dimension", type=_positive_int, metavar="PX", help="Downscale so the longest side is at most PX pixels")
+    parser.add_argument("--keep-alpha", action="store_true", help="Keep transparency instead of flattening it")
+    parser.add_argument("--background", type=ImageColor.getrgb, default=DEFAULT_BACKGROUND, metavar="COLOR",
+                        help="Background used when flattening transparency (e.g. white, #202020)")
+    parser.add_argument("--animation", choices=ANIMATION_MODES, default=DEFAULT_ANIMATION,
+                        help="Animated WebP/GIF: apng keeps frames, durations and loop count; first keeps frame 1; frames writes NAME_0001.png, ...")
+    parser.add_argument("--variants", type=_variants_arg, default=(), metavar="LIST",
+                        help="Also write downscaled copies from the same decode: 'thumb=256,icon=64' -> NAME_thumb.png, NAME_icon.png")
+    parser.add_argument("--metrics-json", metavar="PATH", help="Write per-stage timing/error metrics as JSON")
+    parser.add_argument("--metrics-prom", metavar="PATH", help="Write the same metrics for the Prometheus textfile collector (*.prom)")
+    parser.add_argument("--metrics-interval", type=float, default=30.0, metavar="SEC", help="Rewrite metrics files every SEC seconds during the run")
+    parser.add_argument("--no-journal", action="store_true", help="Do not keep a resume journal in the output folder")
+    parser.add_argument("--layout", choices=OUTPUT_LAYOUTS, default=DEFAULT_LAYOUT,
+                        help="flat: one folder; mirror: copy the source tree; sharded: hash subfolders; inplace: next to each source")
+    parser.add_argument("--formats", type=lambda text: tuple(f.strip().lower() for f in text.split(',') if f.strip()), metavar="LIST",
+                        help=f"Input formats to convert (default: webp,jpeg; available: {','.join(FORMAT_EXTENSIONS)})")
+    parser.add_argument("--extensions", type=lambda text: tuple(e.strip() for e in text.split(',') if e.strip()), metavar="LIST",
+                        help="File extensions to select (default: .webp,.jfif,.jif, or those of --formats)")
+    parser.add_argument("--sniff", choices=SNIFF_MODES, default=DEFAULT_SNIFF_MODE,
+                        help="extension: by name; verify: name + magic bytes; content: magic bytes of every file (finds misnamed images)")
+    parser.add_argument("--memory-budget", type=float, metavar="MB",
+                        help="Admit conversions while their estimated decoded size fits in MB (largest images first, pixel-based ETA)")
+    parser.add_argument("--shard", type=parse_shard, metavar="I/N",
+                        help="Only process shard I of N (stable hash of the relative path); merge with 'python shards.py merge'")
+    parser.add_argument("--prefetch", type=int, default=0, metavar="N",
+                        help="Read up to N upcoming sources ahead (mmap for large files) and write PNGs asynchronously")
+    parser.add_argument("--io-buffer-mb", type=float, default=DEFAULT_IO_BUFFER / 1048576, metavar="MB",
+                        help="Bytes read ahead / waiting to be written with --prefetch")
+    parser.add_argument("--watch", action="store_true", help="Keep running and convert new/modified files as they arrive (Ctrl+C to stop)")
+    parser.add_argument("--initial-scan", action="store_true", help="With --watch: convert the existing files first")
+    parser.add_argument("--poll", action="store_true", help="With --watch: poll the tree instead of using inotify")
+    parser.add_argument("--poll-interval", type=float, default=2.0, metavar="SEC", help="Seconds between polls with --poll")
+    parser.add_argument("--settle", type=float, default=1.0, metavar="SEC", help="With --watch: wait until a file is quiet for SEC seconds")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only log warnings and errors")
+    return parser
+
+def _output_settings(args):
+    return OutputSettings(args.layout, args.profile, args.max_dimension, args.keep_alpha, args.background, args.animation, args.variants)
+
+def main(argv=None):
+    """ Punto de entrada CLI. Sin argumentos lanza la GUI (import diferido de gui.py) """
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        from gui import run_gui
+        run_gui(); return 0
+    parser = build_arg_parser(); args = parser.parse_args(argv)
+    if args.watch:
+        unsupported = [flag for flag, used in (("--dedup", args.dedup), ("--metrics-json", args.metrics_json), ("--metrics-prom", args.metrics_prom),
+                                               ("--memory-budget", args.memory_budget), ("--prefetch", args.prefetch), ("--shard", args.shard)) if used]
+        if unsupported: parser.error(f"--watch does not support {', '.join(unsupported)}")
+    if not os.path.isdir(args.root_directory): print(f"Error: Invalid directory: '{args.root_directory}'", file=sys.stderr); return 2
+    output_folder = os.path.abspath(args.output or os.path.join(os.getcwd(), OUTPUT_FOLDER_NAME))
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    rules = WalkRules(args.exclude, args.max_depth, args.one_file_system, default_excludes=not args.no_default_excludes)
+    metrics = RunMetrics(args.metrics_json, args.metrics_prom, args.metrics_interval) if (args.metrics_json or args.metrics_prom) else None
+    extensions = args.extensions or (None if args.formats else EXTENSIONS_TO_FIND)
+    try: format_filter = FormatFilter(args.formats or DEFAULT_FORMATS, extensions, args.sniff)
+    except ValueError as e: print(f"Error: {e}", file=sys.stderr); return 2
+    reporter = ConsoleReporter(quiet=args.quiet)
+    if args.watch: return _run_watch(args, output_folder, workers, rules, reporter, format_filter)
+    try: counter = scan_and_convert(args.root_directory, output_folder, args.delete_originals, app_instance=reporter,
+                                    workers=workers, executor_kind=args.executor, walk_rules=rules, walk_workers=args.walk_workers,
+                                    use_index=not args.no_index, dedup=args.dedup, dedup_link_mode=args.dedup_link,
+                                    settings=_output_settings(args), metrics=metrics,
+                                    use_journal=not args.no_journal, format_filter=format_filter,
+                                    memory_budget=int(args.memory_budget * 1048576) if args.memory_budget else None,
+                                    shard=args.shard, prefetch=args.prefetch, io_buffer=int(args.io_buffer_mb * 1048576))
+    except KeyboardInterrupt: reporter.stop_scan_flag.set(); print("Interrupted.", file=sys.stderr); return 130
+    return 1 if counter['error'] else 0
+
+def _run_watch(args, output_folder, workers, rules, reporter, format_filter):
+    """ Modo --watch: SIGINT/SIGTERM activan stop_scan_flag para terminar los trabajos en curso antes de salir """
+    from watch import watch_and_convert
+    def request_stop(signum, frame): reporter.stop_scan_flag.set()
+    signal.signal(signal.SIGINT, request_stop); signal.signal(signal.SIGTERM, request_stop)
+    counter = watch_and_convert(args.root_directory, output_folder, args.delete_originals, app_instance=reporter, workers=workers,
+                                executor_kind=args.executor, settings=_output_settings(args), walk_rules=rules,
+                                settle=args.settle, poll_interval=args.poll_interval, use_polling=args.poll,
+                                initial_scan=args.initial_scan, use_index=not args.no_index, format_filter=format_filter,
+                                use_journal=not args.no_journal, walk_workers=args.walk_workers)
+    return 1 if counter['error'] else 0
 
-    def _insert_log(self, message, tag):
-        """ Método interno para insertar en el log """
-        try:
-            if self.log_textbox.winfo_exists():
-                self.log_textbox.configure(state="normal")
-                color_map = {'INFO': getattr(self, 'DARK_FG', '#dcdcdc') if ctk.get_appearance_mode() == "Dark" else "#000000",
-                             'ERROR': getattr(self, 'ERROR_COLOR', '#ff0000'), 'WARN': getattr(self, 'WARN_COLOR', '#ffa500'),
-                             'SUCCESS': getattr(self, 'SUCCESS_COLOR', '#008000'), 'SKIP': getattr(self, 'SKIP_COLOR', '#808080')}
-                if tag not in self.log_textbox.tag_names():
-                    try:
-                        fg_color = color_map.get(tag, color_map['INFO'])
-                        self.log_textbox.tag_config(tag, foreground=fg_color)
-                    except Exception as tag_ex: print(f"Error configuring tag {tag}: {tag_ex}"); tag = 'INFO'
-                self.log_textbox.insert(tk.END, message + "\n", tag)
-                self.log_textbox.configure(state="disabled")
-                self.log_textbox.see(tk.END)
-        except Exception as e: print(f"Log error: {e}")
-
-    def update_progress_and_label(self, value, maximum):
-        """ Actualiza barra y etiqueta de progreso (thread-safe) """
-        self.after(0, self._update_progress_and_label, value, maximum)
-
-    def _update_progress_and_label(self, value, maximum):
-        """ Método interno para actualizar progreso y etiqueta """
-        try:
-            progress_float = 0.0; status_text = ""
-            if maximum > 0:
-                progress_float = max(0.0, min(1.0, float(value) / maximum))
-                if value % 20 == 0 or value == maximum or value == 1:
-                     status_text = f"Processing: {value} / {maximum}"
-                     if self.status_label.winfo_exists(): self.status_label.configure(text=status_text)
-            else:
-                status_text = "Processing: 0 / 0"
-                if self.status_label.winfo_exists(): self.status_label.configure(text=status_text)
-            if self.progress_bar.winfo_exists(): self.progress_bar.set(progress_float)
-        except Exception as e: print(f"Progress update error: {e}")
-
-    def update_status_label(self, text):
-         """ Actualiza solo la etiqueta de estado (thread-safe) """
-         self.after(0, self._update_status_label, text)
-
-    def _update_status_label(self, text):
-        """ Método interno para actualizar etiqueta de estado """
-        try:
-             if self.status_label.winfo_exists(): self.status_label.configure(text=text)
-        except Exception as e: print(f"Status label update error: {e}")
-
-    def show_message(self, title, message, info=False, error=False, warning=False):
-         """ Muestra un messagebox estándar (thread-safe) """
-         self.after(0, self._show_message, title, message, info, error, warning)
-
-    def _show_message(self, title, message, info, error, warning):
-          """ Método interno para mostrar messagebox """
-          try:
-              if self.winfo_exists():
-                  if error: messagebox.showerror(title, message, parent=self)
-                  elif warning: messagebox.showwarning(title, message, parent=self)
-                  else: messagebox.showinfo(title, message, parent=self)
-          except Exception as e: print(f"Messagebox error: {e}")
-
-    def update_ui_state(self, scanning=False):
-        """ Habilita/deshabilita widgets basado en la selección y estado de escaneo """
-        try:
-            scan_controls_state = tk.DISABLED if scanning else tk.NORMAL
-            start_button_state = tk.DISABLED if scanning else tk.NORMAL
-            stop_button_state = tk.NORMAL if scanning else tk.DISABLED
-
-            if hasattr(self, 'rb_current'): self.rb_current.configure(state=scan_controls_state)
-            if hasattr(self, 'rb_specific'): self.rb_specific.configure(state=scan_controls_state)
-            if hasattr(self, 'rb_full'): self.rb_full.configure(state=scan_controls_state)
-            if hasattr(self, 'delete_check'): self.delete_check.configure(state=scan_controls_state)
-
-            is_specific_selected = self.scan_option.get() == "specific" and not scanning
-            if hasattr(self, 'specific_dir_entry'): self.specific_dir_entry.configure(state=tk.NORMAL if is_specific_selected else tk.DISABLED)
-            if hasattr(self, 'browse_button'): self.browse_button.configure(state=tk.NORMAL if is_specific_selected else tk.DISABLED)
-
-            if hasattr(self, 'start_button'): self.start_button.configure(state=start_button_state)
-            if hasattr(self, 'stop_button'): self.stop_button.configure(state=stop_button_state)
-
-        except Exception as e: print(f"Error updating UI state: {e}")
-
-    def browse_directory(self):
-        """ Abre el diálogo para seleccionar carpeta """
-        directory = filedialog.askdirectory(title="Select Directory to Scan")
-        if directory: self.specific_dir.set(directory); self.log(f"Selected specific directory: {directory}", 'INFO')
-
-    def get_scan_path(self):
-        """ Determina la ruta a escanear, manejando la solicitud de admin """
-        option = self.scan_option.get(); scan_path = None
-        if option == "current": scan_path = self.script_dir; self.log(f"Scan target: Current directory ({scan_path})", 'INFO')
-        elif option == "specific":
-            scan_path = self.specific_dir.get()
-            if not scan_path: self.show_message("Input Error", "Please select a specific directory.", error=True); return None
-            if not os.path.isdir(scan_path): self.show_message("Error", f"Invalid directory:\n'{scan_path}'", error=True); return None
-            self.log(f"Scan target: Specific directory ({scan_path})", 'INFO')
-        elif option == "full":
-            if platform.system() == "Windows":
-                if not self.is_currently_admin:
-                    self.log("Admin privileges needed for full scan.", "WARN")
-                    if messagebox.askyesno("Admin Privileges Required",
-                                           "Scanning the entire system requires administrator privileges.\n"
-                                           "The application needs to restart with elevated rights.\n\n"
-                                           "Do you want to restart as administrator now?",
-                                           icon='warning', parent=self):
-                        if run_as_admin():
-                            self.log("Relaunching as administrator...", "INFO")
-                            self.destroy(); return None
-                        else:
-                            self.log("Failed to relaunch as administrator.", "ERROR")
-                            self.show_message("Error", "Could not restart with administrator privileges.", error=True); return None
-                    else:
-                        self.log("Admin privileges denied by user.", "INFO")
-                        self.scan_option.set("current"); self.update_ui_state(); return None
-                dialog = ctk.CTkInputDialog(text="Enter drive letter (e.g., C):", title="Full System Scan")
-                drive_letter = dialog.get_input()
-                if drive_letter:
-                    drive_letter = drive_letter.strip().upper()
-                    if len(drive_letter) == 1 and 'A' <= drive_letter <= 'Z':
-                         root_dir = f"{drive_letter}:\\"
-                         if not os.path.isdir(root_dir): self.show_message("Error", f"Drive {root_dir} not accessible.", error=True); root_dir = None
-                         else: scan_path = root_dir
-                    else: self.show_message("Error", "Invalid drive letter.", error=True)
-                else: return None
-                if scan_path: self.log(f"Scan target: Full scan ({scan_path})", 'WARN')
-            elif platform.system() in ["Linux", "Darwin"]:
-                 root_dir = "/"
-                 warning_msg = (f"!!! WARNING: Scanning entire system ({root_dir}) !!!\n\n"
-                                f"- VERY slow.\n- Requires read permissions everywhere.\n"
-                                f"- Output in '{os.path.basename(self.output_folder_path)}'.\n\nProceed?")
-                 if messagebox.askyesno("Confirm Full Scan", warning_msg, icon='warning', parent=self):
-                     scan_path = root_dir; self.log(f"Scan target: Full scan ({scan_path})", 'WARN')
-                 else: self.log("Full system scan cancelled.", 'INFO'); return None
-            else: self.show_message("Error", f"Unsupported OS ({os_name}).", error=True); return None
-        return scan_path
-
-    def start_scan_thread(self):
-        """ Inicia el escaneo en un hilo separado """
-        if self.scan_thread and self.scan_thread.is_alive():
-             self.show_message("Info", "Scan already in progress.", info=True); return
-        scan_path = self.get_scan_path()
-        if not scan_path: return
-
-        delete = self.delete_originals_var.get(); delete_confirmed = delete
-        if delete:
-            if not messagebox.askyesno("Confirm Deletion", f"ATTENTION! Delete original files in:\n'{scan_path}'?\n\nCANNOT BE UNDONE. Sure?", icon='warning', parent=self):
-                self.log("Deletion cancelled.", 'INFO'); delete_confirmed = False
-            else: self.log("Deletion confirmed.", 'WARN')
-
-        self.update_ui_state(scanning=True)
-        self.progress_bar.set(0)
-        self.status_label.configure(text="Starting...")
-        self.log("Starting scan process...", 'INFO')
-        self.stop_scan_flag.clear()
-        self.scan_thread = threading.Thread(target=self.run_scan, args=(scan_path, self.output_folder_path, delete_confirmed), daemon=True)
-        self.scan_thread.start()
-
-    def stop_scan(self):
-        """ Activa el flag para detener el escaneo en curso """
-        if self.scan_thread and self.scan_thread.is_alive():
-            self.log("Attempting to stop scan...", "WARN")
-            self.update_status_label("Stopping...")
-            self.stop_scan_flag.set()
-            self.stop_button.configure(state=tk.DISABLED)
-        else:
-            self.log("No scan is currently running.", "INFO")
-
-    def run_scan(self, scan_path, output_folder, delete_confirmed):
-        """ Función que se ejecuta en el hilo para realizar el escaneo """
-        try: scan_and_convert(scan_path, output_folder, delete_confirmed, app_instance=self)
-        except Exception as e:
-            self.log(f"\n\n*** THREAD ERROR: {e} ***", 'ERROR'); import traceback; self.log(traceback.format_exc(), 'ERROR')
-            self.show_message("Fatal Error", f"Unexpected scan error. Check log.", error=True)
-        finally:
-            self.after(0, self.scan_finished_ui_update)
-            self.scan_thread = None
-
-    def scan_finished_ui_update(self):
-        """ Actualiza la UI cuando el escaneo termina o se detiene """
-        self.update_ui_state(scanning=False)
-        if not self.stop_scan_flag.is_set(): self.status_label.configure(text="Finished.")
-        else: self.status_label.configure(text="Stopped by user.")
-
-    def on_closing(self):
-        """ Maneja el cierre de la ventana """
-        if self.scan_thread and self.scan_thread.is_alive():
-             if messagebox.askyesno("Exit Confirmation", "Scan in progress. Exit anyway?", icon='warning', parent=self):
-                 self.stop_scan_flag.set()
-                 self.after(100, self.destroy)
-        else:
-             self.destroy()
 
 # --- Punto de Entrada ---
 if __name__ == "__main__":
-    # Comprobaciones iniciales
-    try: from PIL import Image, ImageTk
-    except ImportError: print("CRITICAL ERROR: Pillow library not found."); sys.exit(1)
-    try: import customtkinter
-    except ImportError: print("CRITICAL ERROR: CustomTkinter library not found."); sys.exit(1)
-
-    # Iniciar la aplicación CustomTkinter
-    app = ImageConverterApp()
-    app.mainloop()
+    multiprocessing.freeze_support() # Necesario para ProcessPoolExecutor en ejecutables congelados (PyInstaller)
+    sys.exit(main())
@@ -0,0 +1,110 @@
+""" Deduplicación por contenido: cada payload idéntico se codifica una sola vez """
+import csv
+import hashlib
+import os
+import platform
+import shutil
+
+from atomic import atomic_output, fsync_directory, temp_path_for
+
+# xxhash es opcional (más rápido); si no está se usa blake2b de la librería estándar
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# --- Constantes ---
+DEDUP_REPORT_FILE_NAME = "dedup_report.csv"
+LINK_MODES = ("hardlink", "reflink", "copy")
+HASH_CHUNK_SIZE = 1024 * 1024
+HASH_WORKERS = 4 # Hilos que leen y hashean orígenes por delante del despachador (prefetch.map_ahead)
+_FICLONE = 0x40049409 # ioctl de Linux para reflinks (btrfs, XFS, ...)
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """ Hash en streaming del contenido de un archivo (xxh3_128 o blake2b-128) """
+    hasher = xxhash.xxh3_128() if xxhash else hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''): hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _reflink(fsrc, fdst):
+    """ Intenta clonar el archivo abierto fsrc en fdst (copy-on-write). Devuelve False si el SO/FS no lo soporta """
+    if platform.system() != "Linux": return False
+    import fcntl
+    try: fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno()); return True
+    except OSError: return False
+
+
+def same_output(src, dst):
+    """ True si src y dst son el mismo archivo (misma ruta o ya enlazados): no hay nada que crear """
+    if os.path.normcase(os.path.abspath(src)) == os.path.normcase(os.path.abspath(dst)): return True
+    try: return os.path.samefile(src, dst)
+    except OSError: return False
+
+
+def link_output(src, dst, mode="hardlink", fsync=False):
+    """ Crea (o reemplaza) dst a partir de src con el modo pedido, con copia como último recurso. Devuelve el modo usado
+        Siempre vía temporal + os.replace: dst nunca desaparece ni queda a medias si algo falla.
+        fsync=True persiste contenido y entrada de directorio antes de volver (p. ej. antes de borrar el original) """
+    if mode == "hardlink":
+        temp_path = temp_path_for(dst)
+        try: os.link(src, temp_path); os.replace(temp_path, dst)
+        except OSError:
+            try: os.remove(temp_path)
+            except OSError: pass
+        else:
+            if fsync:
+                with open(dst, 'rb') as f: os.fsync(f.fileno())
+                fsync_directory(os.path.dirname(dst))
+            return "hardlink"
+    with open(src, 'rb') as fsrc, atomic_output(dst, fsync) as fdst:
+        if mode == "reflink" and _reflink(fsrc, fdst): return "reflink"
+        shutil.copyfileobj(fsrc, fdst, HASH_CHUNK_SIZE); return "copy"
+
+
+class DedupTracker:
+    """ Asocia cada hash de contenido con la primera salida que lo codifica
+        claim() decide si un origen se convierte, espera al primero (aún en curso) o reutiliza su salida.
+        Escribe un informe CSV con cada duplicado. derived_outputs(salida) devuelve las salidas adicionales de cada
+        origen (p. ej. variantes), que se enlazan igual que la principal. Usar solo desde un hilo. """
+    CONVERT, WAITING, DUPLICATE = 'convert', 'waiting', 'duplicate'
+
+    def __init__(self, report_path=None, link_mode="hardlink", derived_outputs=None):
+        self.link_mode = link_mode; self.derived_outputs = derived_outputs or (lambda output_path: ()); self.entries = {} # digest -> [origen, salida, resultado | None, esperando]
+        self.duplicates = 0; self.bytes_reused = 0
+        self._report_file = open(report_path, 'w', newline='', encoding='utf-8') if report_path else None
+        self._report = csv.writer(self._report_file) if self._report_file else None
+        if self._report: self._report.writerow(("digest", "source", "output", "original_source", "original_output", "method"))
+
+    def claim(self, digest, source, output_path):
+        """ Devuelve (estado, entrada): CONVERT para el primero, WAITING si el primero sigue en curso, DUPLICATE si ya terminó """
+        entry = self.entries.get(digest)
+        if entry is None: self.entries[digest] = [source, output_path, None, []]; return self.CONVERT, None
+        if entry[2] is None: entry[3].append((source, output_path)); return self.WAITING, entry
+        return self.DUPLICATE, entry
+
+    def resolve(self, digest, result):
+        """ Registra el resultado del primero y devuelve los duplicados que lo esperaban [(origen, salida)] """
+        entry = self.entries[digest]; entry[2] = result
+        waiting, entry[3] = entry[3], []
+        return waiting
+
+    def materialize(self, digest, source, output_path, overwrite=False, fsync=False):
+        """ Crea la salida de un duplicado desde la salida original; devuelve 'converted', 'skipped' o 'error'
+            fsync=True si el origen del duplicado se va a borrar después """
+        original_source, original_output, result, _ = self.entries[digest]
+        if result not in ('converted', 'skipped'): return 'error'
+        pairs = [(original_output, output_path)] + list(zip(self.derived_outputs(original_output), self.derived_outputs(output_path)))
+        pairs = [(src, dst) for src, dst in pairs if not same_output(src, dst)] # p. ej. layout flat: mismo nombre, misma salida
+        if not pairs or (all(os.path.exists(dst) for _, dst in pairs) and not overwrite): return 'skipped'
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        for src, dst in pairs: method = link_output(src, dst, self.link_mode, fsync); self.bytes_reused += os.path.getsize(src)
+        self.duplicates += 1
+        if self._report: self._report.writerow((digest, source, output_path, original_source, original_output, method))
+        return 'converted'
+
+    def close(self):
+        """ Cierra el informe CSV """
+        if self._report_file: self._report_file.close()
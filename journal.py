@@ -0,0 +1,60 @@
+""" Diario (append-only) de trabajos completados para reanudar un escaneo interrumpido """
+import json
+import os
+
+# --- Constantes ---
+JOURNAL_FILE_NAME = ".conversion_journal.jsonl"
+FSYNC_EVERY = 200 # Entradas entre fsync (cada línea se vacía al SO; el fsync acota lo perdido ante un corte de luz)
+
+
+class JobJournal:
+    """ Registra cada origen terminado (una línea JSON por entrada) en la carpeta de salida
+        Si la ejecución anterior no llegó a finish(), sus entradas se cargan en `completed` (origen -> (salida, huella
+        de opciones)) para saltar las que se hicieron con la misma salida y opciones.
+        Tras finish() el siguiente escaneo empieza un diario nuevo. Usar solo desde un hilo. """
+    def __init__(self, output_folder, file_name=JOURNAL_FILE_NAME):
+        os.makedirs(output_folder, exist_ok=True)
+        self.path = os.path.join(output_folder, file_name); self.completed = {}
+        resumed = self._load()
+        if resumed: self._drop_torn_line()
+        self._file = open(self.path, "a" if resumed else "w", encoding="utf-8"); self._unsynced = 0
+        if not resumed: self._append({'event': 'start'})
+
+    def _load(self):
+        """ Carga las entradas de un diario sin terminar. Devuelve True si hay algo que reanudar """
+        if not os.path.exists(self.path): return False
+        completed = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try: entry = json.loads(line)
+                except ValueError: continue # Última línea a medias tras un kill
+                if entry.get('event') == 'end': return False
+                if 'source' in entry: completed[entry['source']] = (entry.get('output'), entry.get('settings', ''))
+        self.completed = completed
+        return True
+
+    def _drop_torn_line(self):
+        """ Recorta la última línea si no termina en salto de línea (kill a mitad de escritura): la siguiente entrada no se le pega """
+        with open(self.path, "rb+") as f:
+            size = end = f.seek(0, os.SEEK_END)
+            while end > 0:
+                step = min(4096, end); f.seek(end - step); newline = f.read(step).rfind(b"\n")
+                if newline >= 0: end = end - step + newline + 1; break
+                end -= step
+            if end != size: f.truncate(end)
+
+    def _append(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n"); self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= FSYNC_EVERY: os.fsync(self._file.fileno()); self._unsynced = 0
+
+    def record(self, source, result, output, settings=''):
+        """ Anota un origen terminado (convertido u omitido porque su salida ya existe) con su huella de opciones """
+        self._append({'source': source, 'result': result, 'output': output, 'settings': settings})
+
+    def close(self, finished=False):
+        """ Cierra el diario; con finished=True lo marca como completo (la siguiente ejecución no reanuda) """
+        try:
+            if finished: self._append({'event': 'end'})
+            self._file.flush(); os.fsync(self._file.fileno())
+        finally: self._file.close()
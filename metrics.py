@@ -0,0 +1,117 @@
+""" Métricas de ejecución: histogramas por etapa, archivos más lentos y errores por tipo (JSON y Prometheus) """
+import heapq
+import json
+import os
+import threading
+import time
+
+# --- Constantes ---
+STAGES = ("walk", "open", "decode", "convert", "encode", "write", "variants", "total")
+# Límites superiores de los buckets en segundos (estilo Prometheus, +Inf implícito)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_PREFIX = "jfif2png"
+SLOWEST_N = 20
+
+
+class Histogram:
+    """ Histograma acumulativo con buckets fijos """
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds; self.counts = [0] * (len(bounds) + 1); self.total = 0.0; self.count = 0
+
+    def observe(self, value):
+        index = next((i for i, bound in enumerate(self.bounds) if value <= bound), len(self.bounds))
+        self.counts[index] += 1; self.total += value; self.count += 1
+
+    def cumulative(self):
+        """ [(límite, cuenta acumulada)], con float('inf') como último límite """
+        running = 0; pairs = []
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts): running += count; pairs.append((bound, running))
+        return pairs
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.total, 'buckets': {('+Inf' if b == float('inf') else str(b)): c for b, c in self.cumulative()}}
+
+
+class RunMetrics:
+    """ Acumula las métricas de un scan_and_convert y las escribe como JSON y/o archivo textfile de Prometheus
+        Thread-safe: el recorrido (walk) y la conversión se registran desde hilos distintos. """
+    def __init__(self, json_path=None, prom_path=None, interval=30.0, slowest_n=SLOWEST_N):
+        self.json_path = json_path; self.prom_path = prom_path; self.interval = interval; self.slowest_n = slowest_n
+        self.histograms = {stage: Histogram() for stage in STAGES}
+        self.results = {'converted': 0, 'skipped': 0, 'error': 0}; self.errors_by_type = {}
+        self.bytes_in = 0; self.bytes_out = 0; self.directories = 0
+        self._slowest = [] # heap mínimo de (segundos, ruta)
+        self.start = time.time(); self.finished = False; self._last_write = self.start
+        self._lock = threading.Lock()
+
+    def observe_directory(self, seconds):
+        """ Registra el tiempo de listar un directorio """
+        with self._lock: self.directories += 1; self.histograms['walk'].observe(seconds)
+
+    def observe_file(self, path, result, stats):
+        """ Registra el resultado y las etapas (stats de convert_to_png) de un archivo """
+        with self._lock:
+            if result in self.results: self.results[result] += 1
+            if stats.get('error_type'): self.errors_by_type[stats['error_type']] = self.errors_by_type.get(stats['error_type'], 0) + 1
+            stages = stats.get('stages') or {}
+            for stage, seconds in stages.items(): self.histograms[stage].observe(seconds)
+            if stages:
+                total = sum(stages.values()); self.histograms['total'].observe(total)
+                if len(self._slowest) < self.slowest_n: heapq.heappush(self._slowest, (total, path))
+                elif total > self._slowest[0][0]: heapq.heapreplace(self._slowest, (total, path))
+            self.bytes_in += stats.get('bytes_in', 0); self.bytes_out += stats.get('bytes_out', 0)
+
+    def to_dict(self):
+        with self._lock:
+            elapsed = time.time() - self.start; processed = sum(self.results.values())
+            return {'started_at': self.start, 'elapsed_seconds': elapsed, 'finished': self.finished,
+                    'results': dict(self.results), 'files_per_second': processed / elapsed if elapsed else 0.0,
+                    'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out, 'directories': self.directories,
+                    'errors_by_type': dict(self.errors_by_type),
+                    'stages': {stage: h.to_dict() for stage, h in self.histograms.items()},
+                    'slowest': [{'path': path, 'seconds': seconds} for seconds, path in sorted(self._slowest, reverse=True)]}
+
+    def to_prometheus(self):
+        """ Texto en formato de exposición de Prometheus (para el textfile collector de node_exporter) """
+        data = self.to_dict(); p = METRIC_PREFIX
+        lines = [f"# HELP {p}_files_total Files processed by result.", f"# TYPE {p}_files_total counter"]
+        lines += [f'{p}_files_total{{result="{result}"}} {count}' for result, count in data['results'].items()]
+        lines += [f"# HELP {p}_errors_total Conversion errors by exception type.", f"# TYPE {p}_errors_total counter"]
+        lines += [f'{p}_errors_total{{type="{error_type}"}} {count}' for error_type, count in data['errors_by_type'].items()]
+        lines += [f"# HELP {p}_stage_seconds Time spent per file (per directory for walk) in each stage.", f"# TYPE {p}_stage_seconds histogram"]
+        with self._lock:
+            for stage, histogram in self.histograms.items():
+                for bound, count in histogram.cumulative():
+                    le = "+Inf" if bound == float('inf') else repr(bound)
+                    lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {count}')
+                lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {histogram.total}')
+                lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        for name, kind, value, help_text in (("bytes_in_total", "counter", data['bytes_in'], "Source bytes converted."),
+                                             ("bytes_out_total", "counter", data['bytes_out'], "PNG bytes written."),
+                                             ("files_per_second", "gauge", data['files_per_second'], "Average throughput of the run."),
+                                             ("run_elapsed_seconds", "gauge", data['elapsed_seconds'], "Seconds since the run started."),
+                                             ("run_in_progress", "gauge", 0 if data['finished'] else 1, "1 while a run is active."),
+                                             ("last_update_timestamp_seconds", "gauge", time.time(), "Unix time of this report.")):
+            lines += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} {kind}", f"{p}_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def maybe_write(self):
+        """ Escribe los informes si pasó `interval` desde la última escritura (llamar periódicamente)
+            Un fallo de escritura intermedio no interrumpe la ejecución; el informe final sí lo reporta """
+        if self.interval and time.time() - self._last_write >= self.interval:
+            try: self.write()
+            except OSError: pass
+
+    def write(self, finished=False):
+        """ Escribe el JSON y el archivo de Prometheus de forma atómica (temporal + rename) """
+        self.finished = self.finished or finished; self._last_write = time.time()
+        if self.json_path: _atomic_write(self.json_path, json.dumps(self.to_dict(), indent=2))
+        if self.prom_path: _atomic_write(self.prom_path, self.to_prometheus())
+
+
+def _atomic_write(path, text):
+    """ Escribe text en path sin que un lector vea nunca un archivo a medias """
+    directory = os.path.dirname(os.path.abspath(path)); os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f: f.write(text)
+    os.replace(temp_path, path)
@@ -0,0 +1,107 @@
+""" Capa de E/S en tubería: lectura anticipada de orígenes a memoria y escritura asíncrona de los PNG
+
+Con almacenamiento lento (red, discos mecánicos) la CPU deja de esperar a Image.open y a la escritura: unos pocos hilos
+leen los próximos orígenes mientras se decodifica/codifica el actual, y otros escriben los PNG ya codificados.
+"""
+import collections
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Constantes ---
+DEFAULT_IO_THREADS = 4
+DEFAULT_IO_BUFFER = 256 * 1024 * 1024 # Bytes máximos leídos por adelantado (y, aparte, pendientes de escribir)
+MMAP_THRESHOLD = 8 * 1024 * 1024 # Desde este tamaño se usa mmap + MADV_WILLNEED en lugar de read()
+_END = object()
+
+
+def read_source(path, use_mmap=True, mmap_threshold=MMAP_THRESHOLD):
+    """ Contenido de path en memoria: bytes, o un mmap de solo lectura (file-like, válido para Image.open) para los
+        archivos grandes, pidiendo al kernel que los lea por adelantado """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not (use_mmap and size >= mmap_threshold): return f.read()
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_WILLNEED'): mapped.madvise(mmap.MADV_WILLNEED)
+    return mapped
+
+
+def map_ahead(items, func, workers=DEFAULT_IO_THREADS, depth=None, weigh=None, max_weight=None):
+    """ Produce (item, func(item)) en el orden de items, con hasta `depth` llamadas adelantadas en un pool de hilos
+        weigh(item) y max_weight acotan además el peso adelantado (p. ej. bytes; siempre se admite uno).
+        Los None de items ("nada listo todavía") se respetan: se entrega lo ya adelantado o se reenvía el None """
+    depth = max(1, depth or workers * 4); window = collections.deque(); weight = 0; exhausted = False
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ahead") as pool:
+        try:
+            while True:
+                while not exhausted and len(window) < depth and (not window or max_weight is None or weight < max_weight):
+                    item = next(items, _END)
+                    if item is _END: exhausted = True; break
+                    if item is None: break # Nada más por ahora: entregar lo que ya esté listo
+                    cost = weigh(item) if weigh else 0; weight += cost
+                    window.append((item, pool.submit(func, item), cost))
+                if not window:
+                    if exhausted: return
+                    yield None; continue
+                item, future, cost = window.popleft(); weight -= cost
+                yield item, future.result()
+        finally:
+            for _, future, _ in window: future.cancel()
+
+
+class Prefetcher:
+    """ Envuelve un generador de trabajos (ruta, salida, borrar, opciones) y los entrega en el mismo orden con
+        opciones['source_data'] ya leído (map_ahead): hasta `depth` lecturas en curso y como mucho `max_bytes` leídos y
+        aún no entregados. use_mmap=False para pools de procesos: el mmap no se puede enviar a otro proceso """
+    def __init__(self, depth=8, max_bytes=DEFAULT_IO_BUFFER, threads=DEFAULT_IO_THREADS, use_mmap=True, mmap_threshold=MMAP_THRESHOLD):
+        self.depth = max(1, depth); self.max_bytes = max_bytes; self.use_mmap = use_mmap; self.mmap_threshold = mmap_threshold
+        self.threads = max(1, threads)
+
+    def _size(self, job):
+        try: return os.path.getsize(job[0])
+        except OSError: return 0
+
+    def _read(self, job):
+        try: return read_source(job[0], self.use_mmap, self.mmap_threshold)
+        except OSError: return None # convert_to_png abrirá la ruta y reportará el error
+
+    def prefetch(self, jobs):
+        for entry in map_ahead(jobs, self._read, self.threads, self.depth, self._size, self.max_bytes):
+            if entry is None: yield None; continue
+            job, data = entry
+            if data is not None: job[3]['source_data'] = data
+            yield job
+
+
+class AsyncWriter:
+    """ Escribe en hilos aparte los PNG ya codificados. submit() bloquea mientras haya más de `max_bytes` pendientes
+        (siempre admite uno) y devuelve un Future con (segundos de escritura, mensajes). El original se borra tras
+        escribir (con fsync) todas sus salidas """
+    def __init__(self, write_func, threads=2, max_bytes=DEFAULT_IO_BUFFER):
+        self.write_func = write_func; self.max_bytes = max_bytes; self.pending_bytes = 0
+        self._cond = threading.Condition(); self._pool = ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="writer")
+
+    def submit(self, outputs, fsync=False, delete_path=None):
+        """ outputs: [(ruta, datos)] de un origen """
+        size = sum(len(data) for _, data in outputs)
+        with self._cond:
+            while self.pending_bytes and self.pending_bytes + size > self.max_bytes: self._cond.wait()
+            self.pending_bytes += size
+        return self._pool.submit(self._write, outputs, fsync or delete_path is not None, delete_path, size)
+
+    def _write(self, outputs, fsync, delete_path, size):
+        start = time.perf_counter(); messages = []
+        try:
+            for path, data in outputs: self.write_func(path, data, fsync)
+            if delete_path:
+                try: os.remove(delete_path)
+                except OSError as e: messages.append((f"*** Error deleting {os.path.basename(delete_path)}: {e}", 'ERROR'))
+            return time.perf_counter() - start, messages
+        finally:
+            with self._cond: self.pending_bytes -= size; self._cond.notify_all()
+
+    def close(self):
+        """ Espera a que terminen todas las escrituras """
+        self._pool.shutdown(wait=True)
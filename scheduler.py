@@ -0,0 +1,107 @@
+""" Planificador con presupuesto de memoria: tamaño por cabecera, admisión por píxeles, mayor primero y ETA por píxel """
+import heapq
+import itertools
+import threading
+import time
+
+from PIL import Image
+
+# --- Constantes ---
+BYTES_PER_PIXEL = 4 # RGBA decodificado
+PEAK_COPIES = 3 # Decodificada + convertida (aplanado/RGB) + buffers de codificación, en el peor caso
+ETA_LOG_INTERVAL = 30.0
+_END = object()
+
+
+def read_dimensions(path):
+    """ (ancho, alto) y formato leyendo solo la cabecera (Image.open no decodifica); None si no es legible """
+    try:
+        with Image.open(path) as img: return img.size, img.format
+    except Exception: return None
+
+def decoded_pixels(size, image_format=None, max_dimension=None):
+    """ Píxeles que ocupará la decodificación: JPEG con max_dimension decodifica a 1/2, 1/4 o 1/8 (draft) """
+    width, height = size
+    if max_dimension and image_format == 'JPEG':
+        scale = 1
+        while scale < 8 and max(width, height) / (scale * 2) >= max_dimension: scale *= 2
+        width, height = -(-width // scale), -(-height // scale)
+    return width * height
+
+def format_eta(seconds):
+    """ Duración legible: 45s, 3m12s, 1h05m """
+    seconds = int(seconds)
+    if seconds < 60: return f"{seconds}s"
+    if seconds < 3600: return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds // 60 % 60:02d}m"
+
+
+class BudgetScheduler:
+    """ Se intercala entre los trabajos de scan_and_convert y run_conversions
+        probe() (desde los hilos del walker) lee el tamaño de cada origen. schedule() retiene hasta `window` trabajos,
+        entrega siempre el de más píxeles y solo si cabe en `budget_bytes` junto a los ya admitidos (uno solo se admite
+        siempre, aunque supere el presupuesto); si no cabe produce None para que run_conversions espere a que termine
+        alguno. release() libera el presupuesto en cuanto llega el resultado de la conversión (la imagen decodificada ya no
+        existe, aunque su PNG siga pendiente de escribir); finish() se llama con cada resultado registrado: libera lo que
+        quede y alimenta la velocidad en píxeles/s que da la ETA """
+    def __init__(self, budget_bytes, window=1000, max_dimension=None):
+        self.budget = budget_bytes; self.window = max(1, window); self.max_dimension = max_dimension
+        self.pixels = {} # ruta -> píxeles decodificados estimados
+        self.total_pixels = 0; self.done_pixels = 0; self.in_use = 0; self.admitted = {}; self.peak_in_use = 0
+        self._heap = []; self._order = itertools.count(); self._lock = threading.Lock()
+        self.started = None; self._last_log = time.time()
+
+    def cost(self, path):
+        """ Bytes de memoria estimados para convertir path """
+        return self.pixels.get(path, 0) * BYTES_PER_PIXEL * PEAK_COPIES
+
+    def probe(self, path):
+        """ Registra los píxeles de path (filtro accept del walker: siempre devuelve True) """
+        info = read_dimensions(path)
+        pixels = decoded_pixels(info[0], info[1], self.max_dimension) if info else 0
+        with self._lock: self.pixels[path] = pixels; self.total_pixels += pixels
+        return True
+
+    def schedule(self, jobs):
+        """ Reordena y filtra por presupuesto un generador de trabajos (job[0] es la ruta de origen) """
+        exhausted = False
+        while True:
+            while not exhausted and len(self._heap) < self.window:
+                job = next(jobs, _END)
+                if job is _END: exhausted = True; break
+                if job is None: break # Nada más en cola por ahora
+                heapq.heappush(self._heap, (-self.cost(job[0]), next(self._order), job))
+            if not self._heap:
+                if exhausted: return
+                yield None; continue
+            cost = -self._heap[0][0]
+            if self.in_use and self.in_use + cost > self.budget: yield None; continue # Esperar a que se libere memoria
+            job = heapq.heappop(self._heap)[2]
+            self.admitted[job[0]] = cost; self.in_use += cost; self.peak_in_use = max(self.peak_in_use, self.in_use)
+            if self.started is None: self.started = time.time()
+            yield job
+
+    def release(self, path):
+        """ La conversión de path terminó: su memoria vuelve al presupuesto (finish() la contabiliza después) """
+        if self.admitted.get(path): self.in_use -= self.admitted[path]; self.admitted[path] = 0
+
+    def finish(self, path):
+        """ Resultado de path: libera su presupuesto (si se admitió) o lo descuenta del total (omitido) """
+        with self._lock: pixels = self.pixels.pop(path, 0)
+        if path in self.admitted: self.in_use -= self.admitted.pop(path); self.done_pixels += pixels
+        else:
+            with self._lock: self.total_pixels -= pixels
+
+    def eta(self):
+        """ Segundos restantes según los píxeles/s medidos desde el primer trabajo admitido, o None sin datos """
+        if not self.started or not self.done_pixels: return None
+        rate = self.done_pixels / max(1e-6, time.time() - self.started)
+        return max(0, self.total_pixels - self.done_pixels) / rate
+
+    def progress_line(self, force=False):
+        """ Línea de progreso con ETA, como mucho cada ETA_LOG_INTERVAL segundos (None si aún no toca) """
+        if not force and time.time() - self._last_log < ETA_LOG_INTERVAL: return None
+        self._last_log = time.time(); eta = self.eta()
+        return (f"Converted {self.done_pixels / 1e6:.0f} of {self.total_pixels / 1e6:.0f} MP"
+                + (f", ETA {format_eta(eta)}" if eta is not None else "")
+                + f" (memory in use {self.in_use / 1048576:.0f} / {self.budget / 1048576:.0f} MB)")
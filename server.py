@@ -0,0 +1,286 @@
+""" Servicio HTTP local (asyncio, solo librería estándar) que convierte imágenes a PNG con un pool de procesos caliente
+
+Uso:
+    python server.py [--host 127.0.0.1] [--port 8765] [-j 4] [--timeout 30] [--max-pending 16] [--allow-paths DIR]
+
+Endpoints:
+    POST /convert                 cuerpo = imagen WebP/JFIF; responde image/png
+    POST /convert?path=SRC        convierte un archivo local (requiere --allow-paths); responde image/png
+    POST /convert?path=SRC&output=DST   escribe el PNG con convert_to_png y responde JSON {"result", "output"}
+    GET  /health                  JSON con estado, capacidad y contadores
+    GET  /metrics                 métricas en formato de exposición de Prometheus
+Opciones de conversión por query string: profile, max_dimension, keep_alpha, background, animation (apng|first), overwrite.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image, ImageColor
+
+import converter
+from metrics import METRIC_PREFIX, RunMetrics
+
+# --- Constantes ---
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_TIMEOUT = 30.0 # Segundos máximos por conversión (incluida la espera en el pool)
+MAX_HEADER_BYTES = 16 * 1024
+DEFAULT_MAX_BODY = 64 * 1024 * 1024
+KEEP_ALIVE_TIMEOUT = 15.0
+_REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+            408: "Request Timeout", 411: "Length Required", 413: "Payload Too Large", 415: "Unsupported Media Type",
+            422: "Unprocessable Entity", 500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+class HTTPError(Exception):
+    """ Error con código HTTP que se devuelve al cliente como JSON """
+    def __init__(self, status, message):
+        super().__init__(message); self.status = status
+
+
+# --- Trabajos del pool (nivel de módulo para poder serializarlos) ---
+def _warm_up():
+    """ Importa los plugins de Pillow en el worker antes de la primera petición """
+    Image.init(); return os.getpid()
+
+def _convert_upload(data, options):
+    stats = {}; png = converter.convert_bytes_to_png(data, stats=stats, **options)
+    return png, stats
+
+def _convert_file(path, options):
+    stats = {'bytes_in': os.path.getsize(path)}
+    with open(path, 'rb') as f: png = converter.convert_bytes_to_png(f, stats=stats, **options)
+    return png, stats
+
+
+def parse_options(query):
+    """ Opciones de conversión desde el query string; HTTPError 400 si alguna no es válida """
+    get = lambda name: query.get(name, [None])[-1]
+    options = {}
+    try:
+        if get('profile') is not None:
+            if get('profile') not in converter.ENCODING_PROFILES: raise ValueError(f"unknown profile {get('profile')!r}")
+            options['profile'] = get('profile')
+        if get('max_dimension') is not None:
+            options['max_dimension'] = int(get('max_dimension'))
+            if options['max_dimension'] < 1: raise ValueError(f"max_dimension must be at least 1, got {options['max_dimension']}")
+        if get('keep_alpha') is not None: options['keep_alpha'] = get('keep_alpha').lower() in ('1', 'true', 'yes')
+        if get('background') is not None: options['background'] = ImageColor.getrgb(get('background'))
+        if get('animation') is not None:
+            if get('animation') not in ("apng", "first"): raise ValueError(f"unsupported animation mode {get('animation')!r}")
+            options['animation'] = get('animation')
+    except ValueError as e: raise HTTPError(400, f"Invalid option: {e}")
+    return options
+
+
+class ConversionService:
+    """ Atiende peticiones HTTP/1.1 (keep-alive) y envía la conversión a un ProcessPoolExecutor
+        Contrapresión: con max_pending trabajos en el pool (en curso + en cola) o cuerpos en lectura, las nuevas peticiones
+        reciben 503 con Retry-After antes de leer su cuerpo (que luego se descarta cerrando la conexión): como mucho
+        max_pending cuerpos de max_body bytes en memoria. Un trabajo que supera timeout recibe 504; si ya
+        se estaba ejecutando sigue contando como pendiente hasta que el worker termina. Si muere un worker (OOM, crash
+        de un decodificador) el pool queda roto: se sustituye por uno nuevo, las peticiones afectadas reciben 503 y
+        /health informa 'degraded' hasta que el nuevo pool está arrancado """
+    def __init__(self, workers=1, timeout=DEFAULT_TIMEOUT, max_pending=None, max_body=DEFAULT_MAX_BODY, allowed_root=None, log_func=print):
+        self.workers = max(1, workers); self.timeout = timeout; self.max_pending = max_pending or self.workers * 4
+        self.max_body = max_body; self.log_func = log_func
+        self.allowed_root = os.path.realpath(allowed_root) if allowed_root else None
+        self.pool = None; self.healthy = False; self.pending = 0; self.reading = 0; self.rejected = 0; self.timeouts = 0; self.requests = 0; self.pool_restarts = 0
+        self.metrics = RunMetrics(interval=0); self.started = time.time()
+
+    # --- Pool ---
+    async def start_pool(self):
+        """ Crea el pool y arranca todos los workers para que la primera petición no pague el arranque """
+        self.pool = ProcessPoolExecutor(max_workers=self.workers); loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _warm_up) for _ in range(self.workers)))
+        self.healthy = True
+
+    async def _restart_pool(self, broken):
+        """ Sustituye un pool roto por uno nuevo ya arrancado (una sola vez aunque fallen varias peticiones a la vez) """
+        if self.pool is not broken: return
+        self.healthy = False; self.pool_restarts += 1
+        self.log_func("*** Warn: A conversion worker died (BrokenProcessPool); restarting the worker pool.", 'WARN')
+        broken.shutdown(wait=False, cancel_futures=True)
+        try: await self.start_pool()
+        except Exception as e: self.log_func(f"*** Error: Could not restart the worker pool: {e}", 'ERROR') # Se reintenta en la siguiente petición
+
+    def shutdown(self):
+        if self.pool is not None: self.pool.shutdown(wait=True, cancel_futures=True)
+
+    async def submit(self, func, *args):
+        """ Ejecuta func en el pool respetando max_pending y timeout """
+        self._check_capacity()
+        loop = asyncio.get_running_loop(); pool = self.pool
+        try: future = pool.submit(func, *args)
+        except BrokenProcessPool: await self._restart_pool(pool); raise HTTPError(503, "Worker pool is restarting, retry later")
+        self.pending += 1; future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        try: return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError: self.timeouts += 1; raise HTTPError(504, f"Conversion exceeded {self.timeout:g}s")
+        except BrokenProcessPool: await self._restart_pool(pool); raise HTTPError(503, "A conversion worker died; the pool was restarted, retry later")
+
+    def _release(self): self.pending -= 1
+
+    def _check_capacity(self):
+        """ HTTPError 503 si ya hay max_pending trabajos en el pool o cuerpos leyéndose """
+        if self.pending + self.reading >= self.max_pending: self.rejected += 1; raise HTTPError(503, "Conversion queue is full, retry later")
+
+    # --- Rutas ---
+    def _checked_path(self, path):
+        """ Ruta local permitida (dentro de --allow-paths) o HTTPError 403 """
+        if self.allowed_root is None: raise HTTPError(403, "Path conversion is disabled (start the server with --allow-paths)")
+        real = os.path.realpath(path)
+        if os.path.commonpath([real, self.allowed_root]) != self.allowed_root: raise HTTPError(403, f"Path outside the allowed root: {path}")
+        return real
+
+    async def convert(self, query, body):
+        """ POST /convert: devuelve (status, content_type, cuerpo) """
+        options = parse_options(query); source = query.get('path', [None])[-1]; output = query.get('output', [None])[-1]
+        label = source or "<upload>"; stats = {}
+        try:
+            if source is None:
+                if not body: raise HTTPError(400, "Empty request body")
+                png, stats = await self.submit(_convert_upload, body, options)
+            elif output is None: png, stats = await self.submit(_convert_file, self._checked_path(source), options)
+            else:
+                options['overwrite'] = query.get('overwrite', ['0'])[-1].lower() in ('1', 'true', 'yes')
+                job = (self._checked_path(source), self._checked_path(output), False, options)
+                result, messages, stats = await self.submit(converter._convert_job, job)
+                self.metrics.observe_file(label, result, stats)
+                body = {'result': result, 'output': job[1], 'messages': [message for message, _ in messages]}
+                return (200 if result != 'error' else 422), "application/json", json.dumps(body).encode()
+        except HTTPError: raise # Rechazos y timeouts se cuentan aparte
+        except FileNotFoundError as e: self.metrics.observe_file(label, 'error', {'error_type': type(e).__name__}); raise HTTPError(404, str(e))
+        except Image.UnidentifiedImageError as e: self.metrics.observe_file(label, 'error', {'error_type': type(e).__name__}); raise HTTPError(415, str(e))
+        except Exception as e: self.metrics.observe_file(label, 'error', {'error_type': type(e).__name__}); raise HTTPError(422, f"{type(e).__name__}: {e}")
+        self.metrics.observe_file(label, 'converted', stats)
+        return 200, "image/png", png
+
+    def health(self):
+        data = self.metrics.to_dict()
+        status = 'starting' if self.pool is None else ('ok' if self.healthy else 'degraded')
+        body = {'status': status, 'workers': self.workers, 'in_flight': self.pending,
+                'capacity': self.max_pending, 'requests': self.requests, 'rejected': self.rejected, 'timeouts': self.timeouts,
+                'pool_restarts': self.pool_restarts, 'results': data['results'], 'uptime_seconds': time.time() - self.started}
+        return (200 if status == 'ok' else 503), "application/json", json.dumps(body).encode()
+
+    def prometheus(self):
+        p = METRIC_PREFIX; lines = [self.metrics.to_prometheus().rstrip("\n")]
+        for name, kind, value, help_text in (("service_in_flight", "gauge", self.pending, "Conversions queued or running in the pool."),
+                                             ("service_capacity", "gauge", self.max_pending, "Maximum conversions admitted at once."),
+                                             ("service_requests_total", "counter", self.requests, "HTTP requests received."),
+                                             ("service_rejected_total", "counter", self.rejected, "Requests rejected with 503 (backpressure)."),
+                                             ("service_timeouts_total", "counter", self.timeouts, "Conversions that exceeded the timeout."),
+                                             ("service_pool_restarts_total", "counter", self.pool_restarts, "Worker pools replaced after a worker died."),
+                                             ("service_healthy", "gauge", int(self.healthy), "1 while the worker pool is running normally.")):
+            lines += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} {kind}", f"{p}_{name} {value}"]
+        return 200, "text/plain; version=0.0.4", ("\n".join(lines) + "\n").encode()
+
+    async def route(self, method, target, body):
+        url = urlsplit(target); query = parse_qs(url.query)
+        if url.path == "/convert":
+            if method != "POST": raise HTTPError(405, "Use POST")
+            return await self.convert(query, body)
+        if url.path in ("/health", "/metrics"):
+            if method not in ("GET", "HEAD"): raise HTTPError(405, "Use GET")
+            return self.health() if url.path == "/health" else self.prometheus()
+        raise HTTPError(404, f"Unknown endpoint: {url.path}")
+
+    # --- HTTP ---
+    async def _read_request(self, reader):
+        """ Lee una petición; devuelve (método, destino, cabeceras, cuerpo) o None si el cliente cerró """
+        try: head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+        except asyncio.IncompleteReadError: return None
+        except asyncio.LimitOverrunError: raise HTTPError(413, "Request headers too large")
+        lines = head.decode('latin-1').split("\r\n")
+        try: method, target, _ = lines[0].split(" ", 2)
+        except ValueError: raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line: name, value = line.split(":", 1); headers[name.strip().lower()] = value.strip()
+        if 'chunked' in headers.get('transfer-encoding', '').lower(): raise HTTPError(411, "Chunked uploads are not supported; send Content-Length")
+        try: length = int(headers.get('content-length', '0'))
+        except ValueError: raise HTTPError(400, "Invalid Content-Length")
+        if length > self.max_body: raise HTTPError(413, f"Body larger than {self.max_body} bytes")
+        if not length: return method.upper(), target, headers, b""
+        self._check_capacity() # Antes de leer el cuerpo: sin capacidad no se acumula en memoria
+        self.reading += 1
+        try: body = await asyncio.wait_for(reader.readexactly(length), self.timeout)
+        finally: self.reading -= 1
+        return method.upper(), target, headers, body
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None: break
+                    method, target, headers, body = request; self.requests += 1
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    status, content_type, payload = await self.route(method, target, body)
+                    if method == "HEAD": payload = b""
+                except HTTPError as e:
+                    status, content_type, payload = e.status, "application/json", json.dumps({'error': str(e)}).encode()
+                except asyncio.TimeoutError: break # Conexión inactiva o cuerpo que no llega
+                except Exception as e:
+                    self.log_func(f"*** Error handling request: {e}", 'ERROR')
+                    status, content_type, payload = 500, "application/json", json.dumps({'error': 'internal error'}).encode()
+                extra = "Retry-After: 1\r\n" if status == 503 else ""
+                writer.write((f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+                              f"Content-Length: {len(payload)}\r\n{extra}Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1'))
+                writer.write(payload); await writer.drain()
+                if not keep_alive: break
+        except (ConnectionError, asyncio.IncompleteReadError): pass
+        finally:
+            writer.close()
+            try: await writer.wait_closed()
+            except ConnectionError: pass
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None, ready=None):
+    """ Arranca el pool y el servidor y atiende hasta SIGINT/SIGTERM; ready(dirección) se llama al empezar a escuchar """
+    service = service or ConversionService()
+    await service.start_pool()
+    server = await asyncio.start_server(service.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    stop = asyncio.Event(); loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try: loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError): pass # Windows o hilo secundario: Ctrl+C llega como KeyboardInterrupt
+    address = server.sockets[0].getsockname()
+    service.log_func(f"Serving on http://{address[0]}:{address[1]} with {service.workers} workers", 'INFO')
+    if ready is not None: ready(address)
+    try:
+        async with server: await stop.wait()
+    finally:
+        service.log_func("Shutting down: waiting for conversions in flight.", 'INFO')
+        await loop.run_in_executor(None, service.shutdown)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="server", description="Local HTTP service converting WebP/JFIF uploads to PNG.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Bind address (default: localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-j", "--workers", type=int, default=0, help="Worker processes (0 = one per CPU core)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds allowed per conversion")
+    parser.add_argument("--max-pending", type=int, help="Conversions admitted at once before answering 503 (default: 4 per worker)")
+    parser.add_argument("--max-body-mb", type=float, default=DEFAULT_MAX_BODY / 1048576, help="Largest accepted upload")
+    parser.add_argument("--allow-paths", metavar="DIR", help="Allow ?path=/?output= conversions of local files under DIR")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only log warnings and errors")
+    args = parser.parse_args(argv)
+    reporter = converter.ConsoleReporter(quiet=args.quiet)
+    service = ConversionService(args.workers if args.workers > 0 else (os.cpu_count() or 1), args.timeout, args.max_pending,
+                                int(args.max_body_mb * 1048576), args.allow_paths, reporter.log)
+    try: asyncio.run(serve(args.host, args.port, service))
+    except KeyboardInterrupt: return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+""" Reparto determinista del trabajo entre máquinas (shards) y fusión de sus manifiestos de resultados
+
+Uso:
+    python converter.py ARCHIVE -o OUT --shard 0/4      # en cada nodo, con su índice
+    python shards.py merge OUT [--json summary.json]    # al terminar todos
+
+Cada origen pertenece al shard stable_hash(ruta relativa) % total (converter.in_shard): sin coordinador y estable
+entre máquinas y SO. Índice, diario e informes llevan el shard en el nombre para compartir la carpeta de salida.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+
+# --- Constantes ---
+MANIFEST_PATTERN = "shard-{index:03d}-of-{count:03d}.manifest.jsonl"
+RESULTS = ('converted', 'skipped', 'error')
+
+
+def parse_shard(text):
+    """ 'I/N' -> (I, N) con 0 <= I < N (para argparse) """
+    try: index, count = (int(part) for part in text.split('/'))
+    except ValueError: raise argparse.ArgumentTypeError(f"expected INDEX/COUNT, got {text!r}")
+    if count < 1 or not 0 <= index < count: raise argparse.ArgumentTypeError(f"shard index must be in 0..{count - 1}")
+    return index, count
+
+def shard_file_name(file_name, shard):
+    """ Nombre de un archivo de estado (índice, diario, informe) propio del shard, para compartir la carpeta de salida
+        '.conversion_index.sqlite' -> '.conversion_index.shard-001-of-004.sqlite' """
+    if shard is None: return file_name
+    stem, ext = os.path.splitext(file_name)
+    return f"{stem}.shard-{shard[0]:03d}-of-{shard[1]:03d}{ext}"
+
+
+class ShardManifest:
+    """ Manifiesto JSONL de un shard: una línea por origen (clave relativa y resultado) y una línea final
+        de resumen. Se escribe en un temporal y se renombra al cerrar: un shard que murió no deja manifiesto.
+        Usar solo desde un hilo """
+    def __init__(self, output_folder, shard, root_directory):
+        os.makedirs(output_folder, exist_ok=True)
+        self.path = os.path.join(output_folder, MANIFEST_PATTERN.format(index=shard[0], count=shard[1]))
+        self.temp_path = self.path + ".tmp"; self.shard = shard; self.started = time.time()
+        self._file = open(self.temp_path, "w", encoding="utf-8")
+        self._append({'event': 'start', 'shard': shard[0], 'count': shard[1], 'root': os.path.abspath(root_directory),
+                      'host': platform.node(), 'started_at': self.started})
+
+    def _append(self, entry): self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def record(self, key, result):
+        self._append({'source': key, 'result': result})
+
+    def close(self, counter, complete):
+        """ Escribe el resumen y publica el manifiesto (complete=False si el shard se detuvo antes de terminar) """
+        self._append({'event': 'end', 'complete': complete, 'counts': {k: counter.get(k, 0) for k in RESULTS},
+                      'elapsed_seconds': time.time() - self.started})
+        self._file.flush(); os.fsync(self._file.fileno()); self._file.close()
+        os.replace(self.temp_path, self.path)
+
+
+def merge_manifests(output_folder):
+    """ Combina los manifiestos de output_folder en un resumen con los mismos contadores que una ejecución única
+        Los contadores salen de las líneas por archivo (no de los resúmenes), así que un origen procesado por dos
+        shards se cuenta una vez (y se reporta en 'overlaps'). Reporta shards ausentes o incompletos """
+    paths = sorted(glob.glob(os.path.join(output_folder, "shard-*-of-*.manifest.jsonl")))
+    results = {}; overlaps = []; shards = {}; counts_seen = set()
+    for path in paths:
+        header = None; end = None
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try: entry = json.loads(line)
+                except ValueError: continue
+                if entry.get('event') == 'start': header = entry
+                elif entry.get('event') == 'end': end = entry
+                elif 'source' in entry:
+                    if entry['source'] in results: overlaps.append(entry['source'])
+                    results[entry['source']] = entry['result']
+        if header is None: continue
+        counts_seen.add(header['count'])
+        shards[header['shard']] = {'manifest': os.path.basename(path), 'host': header.get('host'),
+                                   'complete': bool(end and end.get('complete')),
+                                   'elapsed_seconds': end.get('elapsed_seconds') if end else None}
+    count = max(counts_seen) if counts_seen else 0
+    counter = {result: 0 for result in RESULTS}
+    for result in results.values():
+        if result in counter: counter[result] += 1
+    counter['processed'] = sum(counter[result] for result in RESULTS)
+    return {'shard_count': count, 'shards': shards, 'counts': counter,
+            'missing_shards': [i for i in range(count) if i not in shards],
+            'incomplete_shards': sorted(i for i, info in shards.items() if not info['complete']),
+            'inconsistent_shard_counts': len(counts_seen) > 1, 'overlaps': len(overlaps)}
+
+def format_summary(summary):
+    counts = summary['counts']
+    lines = [f"Shards: {len(summary['shards'])} of {summary['shard_count']} manifests",
+             f"Processed: {counts['processed']} | Converted: {counts['converted']} | Skipped: {counts['skipped']} | Errors: {counts['error']}"]
+    if summary['missing_shards']: lines.append(f"Missing shards: {', '.join(map(str, summary['missing_shards']))}")
+    if summary['incomplete_shards']: lines.append(f"Incomplete shards: {', '.join(map(str, summary['incomplete_shards']))}")
+    if summary['inconsistent_shard_counts']: lines.append("Warning: manifests were produced with different shard counts")
+    if summary['overlaps']: lines.append(f"Warning: {summary['overlaps']} sources appear in more than one manifest")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="shards", description="Merge per-shard conversion manifests.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    merge = sub.add_parser("merge", help="Combine the shard manifests of an output folder into one summary")
+    merge.add_argument("output_folder"); merge.add_argument("--json", metavar="PATH", help="Also write the summary as JSON")
+    args = parser.parse_args(argv)
+    summary = merge_manifests(args.output_folder)
+    print(format_summary(summary))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f: json.dump(summary, f, indent=2)
+    ok = summary['shard_count'] and not (summary['missing_shards'] or summary['incomplete_shards'])
+    return 0 if ok and not summary['counts']['error'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
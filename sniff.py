@@ -0,0 +1,55 @@
+""" Detección del formato por los primeros bytes (magic bytes) y selección configurable de formatos/extensiones """
+import threading
+
+# --- Constantes ---
+SNIFF_BYTES = 16
+SNIFF_MODES = ("extension", "verify", "content") # Solo nombre | nombre + cabecera | solo cabecera (cualquier nombre)
+DEFAULT_SNIFF_MODE = "extension"
+# Extensiones asociadas a cada formato (para --formats sin --extensions)
+FORMAT_EXTENSIONS = {'webp': (".webp",), 'jpeg': (".jfif", ".jif", ".jpg", ".jpeg", ".jpe"), 'gif': (".gif",),
+                     'bmp': (".bmp",), 'tiff': (".tif", ".tiff")}
+DEFAULT_FORMATS = ("webp", "jpeg")
+
+
+def sniff_format(header):
+    """ Formato ('webp', 'jpeg', 'gif', 'bmp', 'tiff') según los primeros bytes de un archivo, o None """
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP": return 'webp'
+    if header[:3] == b"\xff\xd8\xff": return 'jpeg' # SOI + marcador (APP0 'JFIF', APP1 'Exif', ...)
+    if header[:6] in (b"GIF87a", b"GIF89a"): return 'gif'
+    if header[:2] == b"BM" and len(header) >= 14: return 'bmp'
+    if header[:4] in (b"II*\x00", b"MM\x00*"): return 'tiff'
+    return None
+
+def sniff_file(path):
+    """ sniff_format de un archivo leyendo solo SNIFF_BYTES; None si no se reconoce o no se puede leer """
+    try:
+        with open(path, 'rb') as f: return sniff_format(f.read(SNIFF_BYTES))
+    except OSError: return None
+
+
+class FormatFilter:
+    """ Decide qué archivos del recorrido se convierten
+        extension: por extensión (comportamiento clásico). verify: extensión + cabecera, descartando sin Image.open
+        los que no son imágenes de un formato admitido. content: cabecera de todos los archivos, sea cual sea el
+        nombre (encuentra imágenes mal nombradas; lee 16 bytes por archivo). accepts() es seguro desde los hilos del
+        walker; `rejected` cuenta los descartados por cabecera """
+    def __init__(self, formats=DEFAULT_FORMATS, extensions=None, mode=DEFAULT_SNIFF_MODE):
+        unknown = [f for f in formats if f not in FORMAT_EXTENSIONS]
+        if unknown: raise ValueError(f"Unknown format(s): {', '.join(unknown)}")
+        if mode not in SNIFF_MODES: raise ValueError(f"Unknown sniff mode: {mode!r}")
+        self.formats = frozenset(formats); self.mode = mode
+        if extensions is None: extensions = tuple(ext for f in formats for ext in FORMAT_EXTENSIONS[f])
+        self.extensions = tuple(ext.lower() if ext.startswith('.') else '.' + ext.lower() for ext in extensions)
+        self.rejected = 0; self._lock = threading.Lock()
+
+    def matches_name(self, name):
+        """ Filtro barato por nombre (en modo content acepta cualquiera) """
+        return self.mode == "content" or name.lower().endswith(self.extensions)
+
+    def accepts(self, path):
+        """ Comprobación de contenido para un archivo que pasó matches_name """
+        if self.mode == "extension": return True
+        if sniff_file(path) in self.formats: return True
+        if self.mode == "verify":
+            with self._lock: self.rejected += 1
+        return False
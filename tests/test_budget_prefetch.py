@@ -0,0 +1,33 @@
+""" Regresión: --memory-budget con --prefetch (escrituras asíncronas) no debe quedarse esperando para siempre """
+import os
+import sys
+import threading
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import converter
+
+
+def _make_sources(folder, count=4, size=(600, 400)):
+    os.makedirs(folder)
+    for i in range(count): Image.new('RGB', size, (i * 40, 80, 160)).save(os.path.join(folder, f"img{i}.jfif"), "JPEG")
+
+
+def _run_with_timeout(timeout, **kwargs):
+    result = {}
+    reporter = converter.Reporter()
+    thread = threading.Thread(target=lambda: result.update(converter.scan_and_convert(app_instance=reporter, **kwargs)), daemon=True)
+    thread.start(); thread.join(timeout)
+    if thread.is_alive(): reporter.stop_scan_flag.set(); thread.join(5); pytest.fail(f"scan_and_convert did not finish in {timeout}s")
+    return result
+
+
+@pytest.mark.parametrize("workers,executor_kind", [(1, 'process'), (2, 'thread')])
+def test_memory_budget_with_prefetch_finishes(tmp_path, workers, executor_kind):
+    source = str(tmp_path / "src"); output = str(tmp_path / "out"); _make_sources(source)
+    counter = _run_with_timeout(30, root_directory=source, output_base_folder=output, workers=workers, executor_kind=executor_kind,
+                                memory_budget=1, prefetch=2, use_index=False, use_journal=False)
+    assert counter['converted'] == 4 and counter['error'] == 0
+    assert sorted(os.listdir(output)) == [f"img{i}.png" for i in range(4)]
@@ -0,0 +1,29 @@
+""" Deduplicación: un duplicado cuya salida es la misma que la del original no debe borrarla """
+import os
+import shutil
+import sys
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import converter
+
+
+def test_flat_duplicates_sharing_an_output_survive_a_settings_change(tmp_path):
+    source = tmp_path / "src"; output = str(tmp_path / "out")
+    os.makedirs(source / "a"); os.makedirs(source / "b")
+    Image.new('RGB', (40, 30), (10, 120, 200)).save(source / "a" / "same.webp")
+    shutil.copy(source / "a" / "same.webp", source / "b" / "same.webp")
+    first = converter.scan_and_convert(str(source), output, dedup=True)
+    assert first['error'] == 0
+    second = converter.scan_and_convert(str(source), output, dedup=True, settings=converter.OutputSettings(profile="fast")) # Otra huella: overwrite=True
+    assert second['error'] == 0
+    with Image.open(os.path.join(output, "same.png")) as img: assert img.size == (40, 30)
+
+
+def test_copy_link_mode_replaces_existing_output(tmp_path):
+    from dedup import link_output
+    src = tmp_path / "src.png"; dst = tmp_path / "dst.png"
+    src.write_bytes(b"new"); dst.write_bytes(b"old")
+    assert link_output(str(src), str(dst), "copy") == "copy"
+    assert dst.read_bytes() == b"new" and sorted(os.listdir(tmp_path)) == ["dst.png", "src.png"]
@@ -0,0 +1,38 @@
+""" Perfil 'smallest': la reducción a paleta no debe cambiar ningún píxel ni agrandar el PNG """
+import io
+import os
+import random
+import sys
+
+import pytest
+from PIL import Image, ImageChops
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import converter
+
+
+def _image_with_colors(count, size=(64, 64), seed=0):
+    rng = random.Random(seed); colors = [tuple(rng.randrange(256) for _ in range(3)) for _ in range(count)]
+    img = Image.new('RGB', size); img.putdata([colors[i % count] for i in range(size[0] * size[1])])
+    return img
+
+def _gradient(count, size=(64, 64)):
+    """ Colores muy próximos entre sí: (0,0,255), (1,0,254), ... donde la búsqueda aproximada de quantize falla """
+    pixels = size[0] * size[1]; img = Image.new('RGB', size)
+    img.putdata([(i * count // pixels, i * count // pixels // 2, 255 - i * count // pixels) for i in range(pixels)])
+    return img
+
+
+@pytest.mark.parametrize("img", [_image_with_colors(count) for count in (2, 65, 200, 256)] + [_gradient(count) for count in (2, 65, 200, 256)])
+def test_smallest_profile_is_lossless(img):
+    png_buffer = io.BytesIO(); converter.save_png(img, png_buffer, "smallest")
+    png_buffer.seek(0)
+    with Image.open(png_buffer) as decoded:
+        assert ImageChops.difference(img, decoded.convert('RGB')).getbbox() is None
+
+
+def test_smallest_profile_keeps_smaller_encoding():
+    img = _image_with_colors(65)
+    smallest = io.BytesIO(); converter.save_png(img, smallest, "smallest")
+    balanced = io.BytesIO(); converter.save_png(img, balanced, "balanced")
+    assert smallest.tell() <= balanced.tell()
@@ -0,0 +1,87 @@
+""" Recorrido rápido de directorios: os.scandir + pool de hilos + reglas de poda """
+import copy
+import fnmatch
+import os
+import platform
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# --- Constantes ---
+# Directorios que nunca contienen imágenes a convertir y que solo hacen lento el recorrido
+DEFAULT_EXCLUDES = (".git", ".hg", ".svn", "node_modules", "__pycache__")
+# Sistemas de archivos virtuales de Linux (un escaneo completo de "/" los recorrería)
+LINUX_PSEUDO_FS = ("/proc", "/sys", "/dev", "/run")
+DEFAULT_WALK_WORKERS = 8
+
+
+def _norm(path):
+    """ Normaliza una ruta para comparaciones (absoluta y con mayúsculas/minúsculas según el SO) """
+    return os.path.normcase(os.path.abspath(path))
+
+
+class WalkRules:
+    """ Reglas de poda: globs de exclusión, profundidad máxima, mismo sistema de archivos y rutas excluidas """
+    def __init__(self, exclude=(), max_depth=None, same_filesystem=False, exclude_paths=(), default_excludes=True):
+        self.exclude = tuple(exclude) + (DEFAULT_EXCLUDES if default_excludes else ())
+        self.max_depth = max_depth; self.same_filesystem = same_filesystem
+        paths = list(exclude_paths)
+        if default_excludes and platform.system() == "Linux": paths += LINUX_PSEUDO_FS
+        self.exclude_paths = {_norm(p) for p in paths}
+
+    def excluding(self, path):
+        """ Copia de las reglas que además excluye `path` (p. ej. la carpeta de salida) """
+        rules = copy.copy(self); rules.exclude_paths = self.exclude_paths | {_norm(path)}
+        return rules
+
+    def is_excluded(self, name, path):
+        """ True si el nombre o la ruta coinciden con alguna exclusión """
+        if self.exclude_paths and os.path.normcase(path) in self.exclude_paths: return True
+        return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern) for pattern in self.exclude)
+
+
+def _list_dir(path, depth, match, rules, root_dev, accept=None):
+    """ Lista un directorio usando la info de tipo cacheada de DirEntry: devuelve (archivos, subdirectorios, error, segundos) """
+    files = []; subdirs = []; start = time.perf_counter()
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if rules.max_depth is not None and depth >= rules.max_depth: continue
+                        if rules.is_excluded(entry.name, entry.path): continue
+                        if root_dev is not None and entry.stat(follow_symlinks=False).st_dev != root_dev: continue
+                        subdirs.append(entry.path)
+                    elif match(entry.name) and entry.is_file() and not rules.is_excluded(entry.name, entry.path):
+                        if accept is None or accept(entry.path): files.append(entry.path)
+                except OSError: continue
+    except OSError as e: return files, subdirs, e, time.perf_counter() - start
+    return files, subdirs, None, time.perf_counter() - start
+
+
+def walk_files(root_directory, match, rules=None, workers=DEFAULT_WALK_WORKERS, onerror=None, stop_flag=None, on_directory=None,
+               accept=None):
+    """ Produce las rutas bajo root_directory cuyo nombre cumple match(nombre)
+        Los subdirectorios se listan en paralelo con `workers` hilos; el orden de salida no está definido.
+        onerror(OSError) se llama para directorios ilegibles y on_directory(ruta, segundos) tras listar cada uno.
+        accept(ruta), si se indica, es un filtro más caro (p. ej. leer la cabecera) que corre en los hilos del listado """
+    rules = rules or WalkRules(); root = os.path.abspath(root_directory)
+    root_dev = os.stat(root).st_dev if rules.same_filesystem else None
+    stopped = lambda: stop_flag is not None and stop_flag.is_set()
+    workers = max(1, workers); backlog = [(root, 0)]; pending = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="walk") as pool:
+        try:
+            while (backlog or pending) and not stopped():
+                # Pila (DFS) + ventana acotada de listados en curso: el backlog se mantiene pequeño frente a BFS
+                while backlog and len(pending) < workers * 2:
+                    path, depth = backlog.pop()
+                    pending[pool.submit(_list_dir, path, depth, match, rules, root_dev, accept)] = (path, depth)
+                done, _ = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, depth = pending.pop(future)
+                    files, subdirs, error, seconds = future.result()
+                    if error is not None and onerror: onerror(error)
+                    if on_directory: on_directory(path, seconds)
+                    backlog.extend((sub, depth + 1) for sub in subdirs)
+                    yield from files
+        finally:
+            for future in pending: future.cancel()
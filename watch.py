@@ -0,0 +1,210 @@
+""" Modo vigilancia: convierte los archivos nuevos según llegan, sin volver a recorrer el árbol
+
+Linux usa inotify (vía ctypes, sin dependencias); el resto de sistemas, o si inotify falla, un sondeo periódico.
+"""
+import ctypes
+import ctypes.util
+import os
+import platform
+import queue
+import select
+import struct
+import threading
+import time
+
+from conversion_index import ConversionIndex
+from converter import EXTENSIONS_TO_FIND, OutputSettings, Reporter, output_path_for, run_conversions, scan_and_convert
+from sniff import FormatFilter
+from walker import DEFAULT_WALK_WORKERS, WalkRules, walk_files
+
+# --- Constantes ---
+DEFAULT_SETTLE = 1.0 # Segundos sin eventos antes de convertir un archivo (escrituras en varios pasos)
+DEFAULT_POLL_INTERVAL = 2.0
+# Máscaras de inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008; IN_MOVED_TO = 0x00000080; IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000; IN_IGNORED = 0x00008000; IN_ISDIR = 0x40000000; IN_ONLYDIR = 0x01000000
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_ONLYDIR
+_EVENT_HEADER = struct.Struct("iIII") # wd, mask, cookie, len
+
+
+def _is_candidate(name, format_filter):
+    """ Nombre de archivo a convertir (ignora temporales ocultos *.tmp) """
+    return format_filter.matches_name(name) and not (name.startswith('.') and name.endswith('.tmp'))
+
+
+class InotifyWatcher:
+    """ Vigila un árbol con inotify: CLOSE_WRITE/MOVED_TO marcan archivos listos; las carpetas nuevas se añaden solas """
+    def __init__(self, root_directory, format_filter=None, rules=None, settle=DEFAULT_SETTLE, log_func=print):
+        self.root = os.path.abspath(root_directory); self.rules = rules or WalkRules()
+        self.format_filter = format_filter or FormatFilter(extensions=EXTENSIONS_TO_FIND)
+        self.settle = settle; self.log_func = log_func
+        self.pending = {} # ruta -> (instante en que estará lista, overwrite)
+        self.watches = {} # wd -> carpeta
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0: raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        try: self._add_tree(self.root, enqueue_existing=False)
+        except OSError: self.close(); raise
+
+    def _add_watch(self, directory):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0: raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory} (raise fs.inotify.max_user_watches?)")
+        self.watches[wd] = directory
+
+    def _add_tree(self, directory, enqueue_existing):
+        """ Añade vigilancias a directory y sus subcarpetas; opcionalmente encola los archivos que ya contienen
+            (los que llegaron antes de que la vigilancia existiera) """
+        for current, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if not self.rules.is_excluded(d, os.path.join(current, d))]
+            self._add_watch(current)
+            if enqueue_existing:
+                for name in files:
+                    if _is_candidate(name, self.format_filter): self._mark(os.path.join(current, name), overwrite=False)
+
+    def _mark(self, path, overwrite=True):
+        self.pending[path] = (time.monotonic() + self.settle, overwrite)
+
+    def _rescan(self):
+        """ Tras un desbordamiento de la cola del kernel: re-vigila todo y encola solo lo que no tenga salida """
+        self.log_func("*** Warn: inotify event queue overflowed; rescanning the watched tree.", 'WARN')
+        self._add_tree(self.root, enqueue_existing=True)
+
+    def poll(self, timeout):
+        """ Espera eventos hasta `timeout` s y devuelve [(ruta, overwrite)] de los archivos ya asentados """
+        if self.pending: timeout = max(0.0, min(timeout, min(ready for ready, _ in self.pending.values()) - time.monotonic()))
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            try: data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError: data = b""
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                raw_name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].split(b"\0", 1)[0]
+                offset += _EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW: self._rescan(); continue
+                if mask & IN_IGNORED: self.watches.pop(wd, None); continue
+                directory = self.watches.get(wd)
+                if directory is None or not raw_name: continue
+                name = os.fsdecode(raw_name); path = os.path.join(directory, name)
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and not self.rules.is_excluded(name, path):
+                        try: self._add_tree(path, enqueue_existing=True)
+                        except OSError as e: self.log_func(f"*** Warn: Cannot watch new folder {path}: {e}", 'WARN')
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and _is_candidate(name, self.format_filter) and not self.rules.is_excluded(name, path):
+                    self._mark(path)
+        now = time.monotonic(); ready = [(path, overwrite) for path, (at, overwrite) in self.pending.items() if at <= now]
+        for path, _ in ready: del self.pending[path]
+        return [(path, overwrite) for path, overwrite in ready if os.path.isfile(path) and self.format_filter.accepts(path)]
+
+    def close(self):
+        if self.fd >= 0: os.close(self.fd); self.fd = -1
+
+
+class PollingWatcher:
+    """ Alternativa portable: recorre el árbol cada `interval` s y devuelve los archivos nuevos o modificados cuyo
+        tamaño y mtime no cambiaron durante al menos `settle` s. Guarda (size, mtime) por archivo vigilado """
+    def __init__(self, root_directory, format_filter=None, rules=None, settle=DEFAULT_SETTLE,
+                 interval=DEFAULT_POLL_INTERVAL, log_func=print):
+        self.root = root_directory; self.rules = rules or WalkRules()
+        self.format_filter = format_filter or FormatFilter(extensions=EXTENSIONS_TO_FIND)
+        self.settle = settle; self.interval = interval; self.log_func = log_func
+        self.known = self._snapshot() # Los archivos existentes al arrancar no se convierten (usar initial_scan)
+        self.pending = {} # ruta -> (firma, visto desde)
+        self._next_poll = time.monotonic() + interval
+
+    def _snapshot(self):
+        state = {}
+        for path in walk_files(self.root, lambda name: _is_candidate(name, self.format_filter), self.rules):
+            try: st = os.stat(path)
+            except OSError: continue
+            state[path] = (st.st_size, st.st_mtime_ns)
+        return state
+
+    def poll(self, timeout):
+        """ Igual que InotifyWatcher.poll: duerme hasta el siguiente sondeo (máximo `timeout` s) """
+        wait = self._next_poll - time.monotonic()
+        if wait > 0: time.sleep(min(wait, timeout))
+        if time.monotonic() < self._next_poll: return []
+        self._next_poll = time.monotonic() + self.interval; now = time.monotonic()
+        current = self._snapshot(); ready = []
+        for path, signature in current.items():
+            if self.known.get(path) == signature: continue
+            previous = self.pending.get(path)
+            if previous is None or previous[0] != signature: self.pending[path] = (signature, now); continue
+            if now - previous[1] >= self.settle:
+                if self.format_filter.accepts(path): ready.append((path, path in self.known))
+                self.known[path] = signature; del self.pending[path]
+        for path in [p for p in self.known if p not in current]: del self.known[path] # Borrados
+        return ready
+
+    def close(self): pass
+
+
+def create_watcher(root_directory, rules=None, settle=DEFAULT_SETTLE, poll_interval=DEFAULT_POLL_INTERVAL, use_polling=False,
+                   log_func=print, format_filter=None):
+    """ InotifyWatcher en Linux (salvo use_polling); si no está disponible, PollingWatcher """
+    if not use_polling and platform.system() == "Linux":
+        try: return InotifyWatcher(root_directory, format_filter, rules, settle, log_func)
+        except OSError as e: log_func(f"*** Warn: inotify unavailable ({e}); falling back to polling.", 'WARN')
+    return PollingWatcher(root_directory, format_filter, rules, settle, poll_interval, log_func)
+
+
+def watch_and_convert(root_directory, output_base_folder, delete_originals=False, app_instance=None, workers=1,
+                      executor_kind='process', settings=None, walk_rules=None, settle=DEFAULT_SETTLE,
+                      poll_interval=DEFAULT_POLL_INTERVAL, use_polling=False, queue_size=1000, initial_scan=False, use_index=True,
+                      format_filter=None, use_journal=True, walk_workers=DEFAULT_WALK_WORKERS):
+    """ Vigila root_directory y convierte con convert_to_png cada archivo nuevo o modificado hasta que se active
+        app_instance.stop_scan_flag. Un hilo vigila y llena una cola acotada (si la conversión no da abasto, la
+        vigilancia espera). Al parar se terminan los trabajos en curso. Devuelve el contador acumulado """
+    app_instance = app_instance or Reporter(); log_func = app_instance.log; stop_flag = app_instance.stop_scan_flag
+    counter = {'converted': 0, 'skipped': 0, 'error': 0, 'processed': 0}
+    settings = settings or OutputSettings(); settings.validate()
+    rules = (walk_rules or WalkRules()).excluding(output_base_folder)
+    # La vigilancia empieza antes del escaneo inicial: lo que llegue mientras dura no se pierde (si el escaneo
+    # ya lo convirtió, la segunda conversión lo omite o lo reescribe)
+    watcher = create_watcher(root_directory, rules, settle, poll_interval, use_polling, log_func, format_filter)
+    if initial_scan:
+        try: counter.update(scan_and_convert(root_directory, output_base_folder, delete_originals, app_instance, workers=workers,
+                                             executor_kind=executor_kind, walk_rules=walk_rules, use_index=use_index, settings=settings,
+                                             format_filter=format_filter, use_journal=use_journal, walk_workers=walk_workers))
+        except BaseException: watcher.close(); raise
+        if stop_flag.is_set(): watcher.close(); return counter
+    log_func(f"Watching {root_directory} ({type(watcher).__name__}); output: {output_base_folder}. Press Ctrl+C to stop.", 'INFO')
+    work_queue = queue.Queue(maxsize=max(1, queue_size)); root_abs = os.path.abspath(root_directory)
+    index = None; settings_key = settings.key()
+    if use_index:
+        try: index = ConversionIndex(output_base_folder)
+        except Exception as e: log_func(f"*** Warn: Conversion index unavailable: {e}", 'WARN')
+
+    def watch_loop():
+        try:
+            while not stop_flag.is_set():
+                for item in watcher.poll(0.5):
+                    while not stop_flag.is_set():
+                        try: work_queue.put(item, timeout=0.5); break
+                        except queue.Full: pass
+        except Exception as e: log_func(f"*** Watcher error: {e} ***", 'ERROR'); stop_flag.set()
+
+    def make_jobs():
+        while not stop_flag.is_set():
+            try: path, overwrite = work_queue.get(timeout=0.5)
+            except queue.Empty: yield None; continue # Deja a run_conversions entregar los resultados en curso
+            options = dict(settings.conversion_options(), overwrite=overwrite)
+            yield path, output_path_for(path, root_abs, output_base_folder, settings.layout), delete_originals, options
+
+    thread = threading.Thread(target=watch_loop, daemon=True, name="watcher"); thread.start()
+    try:
+        for job, result, messages, _ in run_conversions(make_jobs(), workers, executor_kind, stop_flag):
+            for message, tag in messages: log_func(message, tag)
+            counter['processed'] += 1
+            if result in counter: counter[result] += 1
+            if result == 'converted':
+                log_func(f"Converted: {job[0]} -> {job[1]}", 'SUCCESS')
+                if index is not None:
+                    try: index.record(job[0], os.stat(job[0]), job[1], settings_key)
+                    except OSError: pass # Origen borrado (delete_originals)
+    finally:
+        stop_flag.set(); thread.join(timeout=2); watcher.close()
+        if index is not None: index.close()
+        log_func(f"Watch stopped. Converted: {counter['converted']} | Skipped: {counter['skipped']} | Errors: {counter['error']}", 'INFO')
+    return counter